@@ -0,0 +1,321 @@
+# Course: CS261 Data Structures
+# Author: Christopher Wilkie
+# Assignment: DirectedGraph / UndirectedGraph
+# Description: Reproducible benchmarks of the graph operations across graph families and sizes
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from directed import DirectedGraph
+from undirected import UndirectedGraph
+
+# largest number of vertices each family is generated for, dense graphs have about V * V / 2 edges
+FAMILY_MAX_SIZE = {
+    'sparse': 10 ** 6,
+    'dense': 2000,
+    'random': 10 ** 6,
+    'grid': 10 ** 6,
+    'scale-free': 10 ** 6,
+}
+
+DIRECTED_OPERATIONS = ('add_vertex', 'add_edge', 'get_edges', 'dfs', 'bfs', 'has_cycle', 'dijkstra')
+UNDIRECTED_OPERATIONS = ('add_vertex', 'add_edge', 'get_edges', 'dfs', 'bfs', 'has_cycle',
+                         'count_connected_components')
+
+
+def sparse_edges(size: int, rnd: random.Random) -> []:
+    """
+    Returns the edges of a random tree on "size" vertices plus size / 10 random extra edges.
+    """
+
+    edges = [(rnd.randrange(vertex), vertex) for vertex in range(1, size)]
+    edges.extend((rnd.randrange(size), rnd.randrange(size)) for _ in range(size // 10))
+
+    return edges
+
+
+def dense_edges(size: int, rnd: random.Random) -> []:
+    """
+    Returns the edges of a random graph where every ordered pair of vertices is an edge with probability 1/2.
+    """
+
+    return [(u, v) for u in range(size) for v in range(size) if u != v and rnd.random() < 0.5]
+
+
+def random_edges(size: int, rnd: random.Random) -> []:
+    """
+    Returns 5 * size edges between uniformly random vertices.
+    """
+
+    return [(rnd.randrange(size), rnd.randrange(size)) for _ in range(5 * size)]
+
+
+def grid_edges(size: int, rnd: random.Random) -> []:
+    """
+    Returns the edges of a square lattice of about "size" vertices, each pointing right or down.
+    """
+
+    side = max(1, int(size ** 0.5))
+    edges = []
+
+    for row in range(side):
+        for column in range(side):
+            vertex = row * side + column
+            if column + 1 < side:
+                edges.append((vertex, vertex + 1))
+            if row + 1 < side:
+                edges.append((vertex, vertex + side))
+
+    return edges
+
+
+def scale_free_edges(size: int, rnd: random.Random) -> []:
+    """
+    Returns the edges of a Barabasi-Albert graph where every new vertex attaches to 3 existing vertices
+    picked with probability proportional to their degree.
+    """
+
+    edges = []
+    endpoints = [0]
+
+    for vertex in range(1, size):
+        for _ in range(min(3, vertex)):
+            target = rnd.choice(endpoints)
+            edges.append((vertex, target))
+            endpoints.append(target)
+        endpoints.append(vertex)
+
+    return edges
+
+
+FAMILIES = {
+    'sparse': sparse_edges,
+    'dense': dense_edges,
+    'random': random_edges,
+    'grid': grid_edges,
+    'scale-free': scale_free_edges,
+}
+
+
+def measure(function, repeat: int, memory: bool) -> dict:
+    """
+    Times "function" over "repeat" calls and, if asked, measures the peak memory allocated by one more call.
+    """
+
+    seconds = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - start)
+
+    result = {'seconds': seconds, 'best': min(seconds), 'mean': sum(seconds) / len(seconds)}
+
+    if memory:
+        tracemalloc.start()
+        function()
+        result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return result
+
+
+def uncached(graph, method, starts):
+    """
+    Returns a function calling "method" from the next start vertex with the query cache of "graph" emptied,
+    so every run measures the traversal rather than a cache hit.
+    """
+
+    def function():
+        graph._query_cache().clear()
+        method(next(starts))
+
+    return function
+
+
+def directed_cases(size: int, edges: [], rnd: random.Random):
+    """
+    Yields (operation, function) pairs for DirectedGraph on the given edges.
+    """
+
+    weighted = [(u, v, rnd.randint(1, 100)) for u, v in edges if u != v]
+    graph = DirectedGraph()
+    graph.add_vertices(size)
+    graph.add_edges(weighted)
+    starts = iter(rnd.randrange(size) for _ in range(10 ** 6))
+
+    def add_vertex():
+        empty = DirectedGraph()
+        for _ in range(size):
+            empty.add_vertex()
+
+    def add_edge():
+        fresh = DirectedGraph()
+        fresh.add_vertices(size)
+        for u, v, weight in weighted:
+            fresh.add_edge(u, v, weight)
+
+    yield 'add_vertex', add_vertex
+    yield 'add_edge', add_edge
+    yield 'get_edges', graph.get_edges
+    yield 'dfs', uncached(graph, graph.dfs, starts)
+    yield 'bfs', uncached(graph, graph.bfs, starts)
+    yield 'has_cycle', graph.has_cycle
+    yield 'dijkstra', uncached(graph, graph.dijkstra, starts)
+
+
+def undirected_cases(size: int, edges: [], rnd: random.Random):
+    """
+    Yields (operation, function) pairs for UndirectedGraph on the given edges, with vertex names as strings.
+    """
+
+    names = [str(vertex) for vertex in range(size)]
+    named = [(names[u], names[v]) for u, v in edges if u != v]
+    starts = iter(rnd.choice(names) for _ in range(10 ** 6))
+    graph = UndirectedGraph()
+
+    for name in names:
+        graph.add_vertex(name)
+
+    graph.add_edges(named)
+
+    def add_vertex():
+        empty = UndirectedGraph()
+        for name in names:
+            empty.add_vertex(name)
+
+    def add_edge():
+        fresh = UndirectedGraph()
+        for u, v in named:
+            fresh.add_edge(u, v)
+
+    def without_index(method):
+        def function():
+            # drop the component index so every run measures a full computation rather than a cached one
+            graph._components = None
+            method()
+        return function
+
+    yield 'add_vertex', add_vertex
+    yield 'add_edge', add_edge
+    yield 'get_edges', graph.get_edges
+    yield 'dfs', uncached(graph, graph.dfs, starts)
+    yield 'bfs', uncached(graph, graph.bfs, starts)
+    yield 'has_cycle', without_index(graph.has_cycle)
+    yield 'count_connected_components', without_index(graph.count_connected_components)
+
+
+def run(sizes: [], families: [], operations: [], repeat: int, memory: bool, seed: int) -> []:
+    """
+    Runs every selected benchmark and returns a list of result dicts.
+    """
+
+    results = []
+
+    for family in families:
+        for size in sizes:
+
+            if size > FAMILY_MAX_SIZE[family]:
+                continue
+
+            rnd = random.Random(seed)
+            edges = FAMILIES[family](size, rnd)
+            size = max([size] + [max(u, v) + 1 for u, v in edges])
+
+            for kind, cases in (('directed', directed_cases), ('undirected', undirected_cases)):
+                for operation, function in cases(size, edges, random.Random(seed)):
+
+                    if operation not in operations:
+                        continue
+
+                    result = measure(function, repeat, memory)
+                    result.update({'graph': kind, 'family': family, 'size': size, 'edges': len(edges),
+                                   'operation': operation})
+                    results.append(result)
+                    print(f"{kind:10} {family:10} {size:>8} {operation:28} {result['best']:.6f}s", file=sys.stderr)
+
+    return results
+
+
+def metadata(seed: int) -> dict:
+    """
+    Returns a description of the code and machine the benchmarks ran on.
+    """
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+
+    return {'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'seed': seed}
+
+
+def compare(results: [], baseline: [], threshold: float) -> []:
+    """
+    Returns a list of (result, baseline result, ratio) for every benchmark whose best time is more than
+    "threshold" times slower than the same benchmark in the baseline.
+    """
+
+    def key(entry):
+        return entry['graph'], entry['family'], entry['size'], entry['operation']
+
+    previous = {key(entry): entry for entry in baseline}
+    regressions = []
+
+    for entry in results:
+        if key(entry) in previous and previous[key(entry)]['best'] > 0:
+            ratio = entry['best'] / previous[key(entry)]['best']
+            if ratio > threshold:
+                regressions.append((entry, previous[key(entry)], ratio))
+
+    return regressions
+
+
+def main(argv=None) -> int:
+    """
+    Command line entry point, returns 1 if a comparison found regressions and 0 otherwise.
+    """
+
+    parser = argparse.ArgumentParser(description='Benchmark the DirectedGraph and UndirectedGraph operations.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10 ** 2, 10 ** 3, 10 ** 4],
+                        help='numbers of vertices, up to 10**6 (default: 100 1000 10000)')
+    parser.add_argument('--families', nargs='+', choices=list(FAMILIES), default=list(FAMILIES))
+    parser.add_argument('--operations', nargs='+', default=sorted(set(DIRECTED_OPERATIONS + UNDIRECTED_OPERATIONS)))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=261)
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc peak memory runs')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='results file of an earlier run to check for regressions')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='slowdown ratio reported as a regression (default: 1.25)')
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.families, args.operations, args.repeat, not args.no_memory, args.seed)
+
+    with open(args.output, 'w') as file:
+        json.dump({'meta': metadata(args.seed), 'results': results}, file, indent=1)
+
+    if args.compare is None:
+        return 0
+
+    with open(args.compare) as file:
+        regressions = compare(results, json.load(file)['results'], args.threshold)
+
+    for entry, previous, ratio in regressions:
+        print(f"REGRESSION {entry['graph']} {entry['family']} {entry['size']} {entry['operation']}: "
+              f"{previous['best']:.6f}s -> {entry['best']:.6f}s ({ratio:.2f}x)")
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+# Course: CS261 Data Structures
+# Author: Christopher Wilkie
+# Assignment: DirectedGraph / UndirectedGraph
+# Description: Helpers letting long graph searches share the asyncio event loop
+
+import asyncio
+
+# number of vertices the async searches expand between two returns to the event loop
+ASYNC_YIELD_EVERY = 1000
+
+
+def deadline(timeout):
+    """
+    Returns the event loop time at which a search started now with "timeout" seconds must stop,
+    or None if there is no timeout.
+    """
+
+    if timeout is None:
+        return None
+
+    return asyncio.get_running_loop().time() + timeout
+
+
+async def pause(end) -> None:
+    """
+    Gives control back to the event loop, which is also where a cancelled search stops.
+    Raises asyncio.TimeoutError if the "end" deadline from deadline() has passed.
+    """
+
+    if end is not None and asyncio.get_running_loop().time() >= end:
+        raise asyncio.TimeoutError('graph search timed out')
+
+    await asyncio.sleep(0)
+
+
+async def cooperative(iterator, every=ASYNC_YIELD_EVERY, timeout=None):
+    """
+    Async iterator over the items of a search generator, returning to the event loop after every
+    "every" items and raising asyncio.TimeoutError once "timeout" seconds have passed.
+    The generator is closed when the iteration ends, fails or is cancelled.
+    """
+
+    end = deadline(timeout)
+
+    try:
+        while True:
+            count = 0
+
+            for item in iterator:
+                yield item
+                count += 1
+
+                if count == every:
+                    break
+            else:
+                return
+
+            await pause(end)
+
+    finally:
+        iterator.close()
@@ -3,6 +3,214 @@
 # Assignment: DirectedGraph
 # Description: A collection of functions used to create and manipulate directedGraphs
 
+import heapq
+import mmap as mmap_module
+import operator
+import os
+import struct
+import sys
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from cooperative import ASYNC_YIELD_EVERY, cooperative
+from edge_files import EDGE_FILE_CHUNK_SIZE, parse_directed_edges, read_edge_chunks, write_edge_file
+from graph_stats import GraphStats
+from query_cache import QueryCache
+from shared_arrays import attach_arrays, release, share_arrays
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# all_pairs_shortest_paths() uses Floyd-Warshall for dense graphs up to this many vertices
+FLOYD_WARSHALL_MAX_VERTICES = 512
+
+# dijkstra_many() runs in this process below this many sources * (V + E), where starting a process pool,
+# about 40 ms, costs more than the searches it would spread out
+PARALLEL_DIJKSTRA_MIN_WORK = 250000
+
+# snapshot file header: magic, format version, byte order, weight typecode, vertex count, edge count
+SNAPSHOT_HEADER = struct.Struct('<4sHcc8xQQ')
+SNAPSHOT_MAGIC = b'DGRF'
+SNAPSHOT_VERSION = 1
+
+
+class _CSRRows:
+    """
+    Sequence of the sparse rows of a DirectedGraph backed by compressed sparse row arrays.
+    The dict of a row is only built from the arrays the first time the row is used, so a graph
+    can be opened from CSR arrays (for example a memory mapped snapshot) in O(V).
+    """
+
+    # with integral set, float weights without a fractional part are turned back into ints
+    integral = False
+
+    def __init__(self, offsets, indices, weights):
+        self._csr = (offsets, indices, weights)
+        self._rows = [None] * (len(offsets) - 1)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, vertex: int) -> dict:
+        row = self._rows[vertex]
+
+        if row is None:
+            # negative indices count from the end as in a list, the offsets need the actual vertex
+            if vertex < 0:
+                vertex += len(self._rows)
+
+            offsets, indices, weights = self._csr
+            start, end = offsets[vertex], offsets[vertex + 1]
+            row = dict(zip(indices[start:end], weights[start:end]))
+
+            if self.integral:
+                row = {dst: int(weight) if weight.is_integer() else weight for dst, weight in row.items()}
+
+            self._rows[vertex] = row
+
+        return row
+
+    def __iter__(self):
+        for vertex in range(len(self._rows)):
+            yield self[vertex]
+
+    def __setitem__(self, vertex: int, row: dict) -> None:
+        self._rows[vertex] = row
+
+    def append(self, row: dict) -> None:
+        self._rows.append(row)
+
+    def extend(self, rows) -> None:
+        self._rows.extend(rows)
+
+    def copy(self) -> '_CSRRows':
+        """
+        Returns a new sequence sharing the arrays and the rows built so far.
+        """
+
+        rows = _CSRRows.__new__(_CSRRows)
+        rows._csr = self._csr
+        rows._rows = list(self._rows)
+        rows.integral = self.integral
+
+        return rows
+
+
+class _ShortestPathTree:
+    """
+    Shortest path distances and tree from one source of a DirectedGraph. After an edge change only the
+    part of the tree the change affects is repaired, in the style of Ramalingam and Reps.
+    """
+
+    def __init__(self, source: int, distances: [], parents: []):
+        self.source = source
+        self.distances = distances
+        self.parents = parents
+
+    def add_vertices(self, count: int) -> None:
+        """
+        Extends the tree with new vertices, which are unreachable until an edge reaches them.
+        """
+
+        self.distances.extend([float('inf')] * count)
+        self.parents.extend([None] * count)
+
+    def path(self, dst: int) -> []:
+        """
+        Returns the list of vertices from the source to "dst" in the tree, empty if "dst" is unreachable.
+        """
+
+        if self.distances[dst] == float('inf'):
+            return []
+
+        path = [dst]
+
+        while path[-1] != self.source:
+            path.append(self.parents[path[-1]])
+
+        path.reverse()
+
+        return path
+
+    def edge_decreased(self, rows: [], src: int, dst: int, weight) -> None:
+        """
+        Repairs the tree after an edge was added or its weight lowered. Only vertices whose distance
+        improves through the new edge are visited.
+        """
+
+        if self.distances[src] + weight >= self.distances[dst]:
+            return None
+
+        self.distances[dst] = self.distances[src] + weight
+        self.parents[dst] = src
+        self._propagate(rows, [(self.distances[dst], dst)])
+
+        return None
+
+    def edge_increased(self, rows: [], columns: [], src: int, dst: int) -> None:
+        """
+        Repairs the tree after an edge was removed or its weight raised. Nothing changes unless the edge
+        is in the tree, otherwise only the subtree below it is recomputed, seeded from its in-edges.
+        """
+
+        if self.parents[dst] != src:
+            return None
+
+        distances = self.distances
+        parents = self.parents
+        affected = [dst]
+
+        # every vertex whose tree path runs through the edge, the list grows while it is walked
+        for vertex in affected:
+            for element in rows[vertex]:
+                if parents[element] == vertex:
+                    affected.append(element)
+
+        for vertex in affected:
+            distances[vertex] = float('inf')
+            parents[vertex] = None
+
+        heap = []
+
+        for vertex in affected:
+            for element, weight in columns[vertex].items():
+                if distances[element] + weight < distances[vertex]:
+                    distances[vertex] = distances[element] + weight
+                    parents[vertex] = element
+
+            if distances[vertex] != float('inf'):
+                heap.append((distances[vertex], vertex))
+
+        heapq.heapify(heap)
+        self._propagate(rows, heap)
+
+        return None
+
+    def _propagate(self, rows: [], heap: []) -> None:
+        """
+        Dijkstra from the improved vertices on the heap, relaxing only edges that lower a distance.
+        """
+
+        distances = self.distances
+        parents = self.parents
+
+        while heap:
+
+            distance, vertex = heapq.heappop(heap)
+
+            if distance > distances[vertex]:
+                continue
+
+            for element, weight in rows[vertex].items():
+                if distance + weight < distances[element]:
+                    distances[element] = distance + weight
+                    parents[element] = vertex
+                    heapq.heappush(heap, (distances[element], element))
+
+
 class DirectedGraph:
     """
     Class to implement directed weighted graph
@@ -12,6 +220,25 @@ class DirectedGraph:
     - vertex names are integers
     """
 
+    # mutation counter, part of every query cache key so cached results never outlive a change
+    _version = 0
+    _cache = None
+
+    # shortest path trees of the sources registered with track_source(), by source
+    _trees = None
+
+    # GraphStats collecting counters and timings while enable_stats() is on, None otherwise
+    _stats = None
+
+    # (out rows, in rows) the graph copied for itself since the last freeze(), None if no frozen copy shares rows
+    _owned = None
+
+    # public methods timed while stats are enabled
+    _TIMED_METHODS = ('add_vertex', 'add_vertices', 'add_edge', 'remove_edge', 'add_edges', 'remove_edges',
+                      'get_edges', 'is_valid_path', 'dfs', 'bfs', 'has_cycle', 'find_cycle', 'topological_sort',
+                      'bfs_levels', 'reachable', 'transitive_closure', 'dijkstra', 'dijkstra_path',
+                      'shortest_path', 'all_pairs_shortest_paths', 'to_csr', 'save', 'to_edge_file')
+
     def __init__(self, start_edges=None):
         """
         Store graph info as adjacency matrix
@@ -50,18 +277,73 @@ class DirectedGraph:
 
     # ------------------------------------------------------------------ #
 
+    @property
+    def adj_matrix(self) -> []:
+        """
+        Dense adjacency matrix view of the graph, built on request from the sparse rows.
+        The view is rebuilt after any change to the graph and writing to it does not change the graph.
+        """
+
+        if self._matrix is None:
+            matrix = [[0] * self.v_count for _ in range(self.v_count)]
+
+            for src, row in enumerate(self._out):
+                for dst, weight in row.items():
+                    matrix[src][dst] = weight
+
+            self._matrix = matrix
+
+        return self._matrix
+
+    @adj_matrix.setter
+    def adj_matrix(self, matrix: []) -> None:
+        """
+        Replaces the content of a DirectedGraph with the edges of a dense adjacency matrix.
+        """
+
+        self._out = [{dst: weight for dst, weight in enumerate(row) if weight != 0} for row in matrix]
+        self._sorted = [None] * len(self._out)
+        self._in = None
+        self._owned = None
+        self._changed()
+        self.v_count = len(self._out)
+        self._rebuild_trees()
+
     def add_vertex(self) -> int:
         """
         Adds a vertex to a DirectedGraph.
         """
 
+        self._out.append(dict())
+        self._sorted.append(None)
+        if self._in is not None:
+            self._in.append(dict())
+        if self._trees:
+            for tree in self._trees.values():
+                tree.add_vertices(1)
+        self._changed()
         self.v_count += 1
-        vertex = [0] * self.v_count
 
-        for element in self.adj_matrix:
-            element.append(0)
+        return self.v_count
+
+    def add_vertices(self, count: int) -> int:
+        """
+        Adds "count" vertices to a DirectedGraph in a single step.
+        Returns the new number of vertices.
+        """
+
+        if count <= 0:
+            return self.v_count
 
-        self.adj_matrix.append(vertex)
+        self._out.extend(dict() for _ in range(count))
+        self._sorted.extend([None] * count)
+        if self._in is not None:
+            self._in.extend(dict() for _ in range(count))
+        if self._trees:
+            for tree in self._trees.values():
+                tree.add_vertices(count)
+        self._changed()
+        self.v_count += count
 
         return self.v_count
 
@@ -71,14 +353,30 @@ class DirectedGraph:
         If the input is invalid returns None. Weights must be a positive integer.
         """
 
+        if type(src) is not int or type(dst) is not int:
+            try:
+                src, dst = operator.index(src), operator.index(dst)
+            except TypeError:
+                return None
+
         if weight <= 0 or src == dst or src < 0 or dst < 0:
             return None
 
-        try:
-            self.adj_matrix[src][dst] = weight
-        except IndexError:
+        if src >= self.v_count or dst >= self.v_count:
             return None
 
+        if self._owned is not None:
+            self._unshare(src, dst)
+
+        old_weight = self._out[src].get(dst)
+        self._out[src][dst] = weight
+        if old_weight is None:
+            self._sorted[src] = None
+        if self._in is not None:
+            self._in[dst][src] = weight
+        self._changed()
+        self._edge_updated(src, dst, old_weight, weight)
+
         return None
 
     def remove_edge(self, src: int, dst: int) -> None:
@@ -86,16 +384,118 @@ class DirectedGraph:
         Removes a weighted edge from a DirectedGraph
         """
 
+        if type(src) is not int or type(dst) is not int:
+            try:
+                src, dst = operator.index(src), operator.index(dst)
+            except TypeError:
+                return None
+
         if src == dst or src < 0 or dst < 0:
             return None
 
-        try:
-            self.adj_matrix[src][dst] = 0
-        except IndexError:
+        if src >= self.v_count or dst >= self.v_count:
             return None
 
+        if self._owned is not None and dst in self._out[src]:
+            self._unshare(src, dst)
+
+        old_weight = self._out[src].pop(dst, None)
+
+        if old_weight is not None:
+            self._sorted[src] = None
+            if self._in is not None:
+                del self._in[dst][src]
+            self._changed()
+            self._edge_updated(src, dst, old_weight, None)
+
         return None
 
+    def add_edges(self, edges) -> []:
+        """
+        Adds every (src, dst, weight) edge of an iterable, the weight may be left out and defaults to 1.
+        Any iterable can be used, including generators and NumPy arrays holding one edge per row, which
+        are validated with vectorised operations. If an edge is given more than once the last weight wins.
+        Returns a list of the edges that were rejected because add_edge() would ignore them.
+        """
+
+        if numpy is not None and isinstance(edges, numpy.ndarray):
+            return self._add_edge_array(edges)
+
+        rows = self._out
+        order = self._sorted
+        columns = self._in
+        owned = self._owned
+        v_count = self.v_count
+        rejected = []
+
+        for edge in edges:
+            src, dst = edge[0], edge[1]
+            weight = edge[2] if len(edge) > 2 else 1
+
+            if type(src) is not int or type(dst) is not int:
+                try:
+                    src, dst = operator.index(src), operator.index(dst)
+                except TypeError:
+                    rejected.append(tuple(edge))
+                    continue
+
+            if weight <= 0 or src == dst or not 0 <= src < v_count or not 0 <= dst < v_count:
+                rejected.append(tuple(edge))
+            else:
+                if owned is not None:
+                    self._unshare(src, dst)
+                rows[src][dst] = weight
+                order[src] = None
+                if columns is not None:
+                    columns[dst][src] = weight
+
+        self._changed()
+        self._rebuild_trees()
+
+        return rejected
+
+    def remove_edges(self, edges) -> []:
+        """
+        Removes every (src, dst) edge of an iterable, a third weight item in each edge is ignored
+        so the output of get_edges() can be used directly.
+        Returns a list of the edges that were rejected because they are not in the graph.
+        """
+
+        rows = self._out
+        order = self._sorted
+        columns = self._in
+        owned = self._owned
+        v_count = self.v_count
+        rejected = []
+
+        for edge in edges:
+            src, dst = edge[0], edge[1]
+
+            if type(src) is not int or type(dst) is not int:
+                try:
+                    src, dst = operator.index(src), operator.index(dst)
+                except TypeError:
+                    rejected.append(tuple(edge))
+                    continue
+
+            if not 0 <= src < v_count or dst not in rows[src]:
+                rejected.append(tuple(edge))
+                continue
+
+            if owned is not None:
+                self._unshare(src, dst)
+
+            del rows[src][dst]
+            order[src] = None
+
+            if columns is not None:
+                del columns[dst][src]
+
+        self._changed()
+        self._rebuild_trees()
+
+        return rejected
+
     def get_vertices(self) -> []:
         """
         Returns a list of vertices contained in a DirectedGraph.
@@ -110,24 +510,18 @@ class DirectedGraph:
         Returns a list of edges represented as tuples (source, destination, weight).
         """
 
-        edge_list = []
-        source = -1
-
-        for vertex in self.adj_matrix:
-
-            source += 1
-            destination = -1
-
-            for edge in vertex:
+        return list(self.iter_edges())
 
-                destination += 1
+    def iter_edges(self):
+        """
+        Generator version of get_edges(), yields the edges one at a time in the same order.
+        """
 
-                if edge == 0:
-                    continue
-                else:
-                    edge_list.append((source, destination, edge))
+        for source in range(self.v_count):
+            row = self._out[source]
 
-        return edge_list
+            for destination in self._neighbours(source):
+                yield source, destination, row[destination]
 
     def is_valid_path(self, path: []) -> bool:
         """
@@ -140,7 +534,7 @@ class DirectedGraph:
 
         while destination < len(path):
 
-            if self.adj_matrix[path[source]][path[destination]] == 0:
+            if path[destination] not in self._out[path[source]]:
                 return False
 
             source += 1
@@ -154,148 +548,1133 @@ class DirectedGraph:
         Vertices are picked in numerical order.
         """
 
-        if v_start > self.v_count or v_start < 0:
-            return []
+        return list(self._cached('dfs', (v_start, v_end), lambda: list(self.iter_dfs(v_start, v_end))))
+
+    def bfs(self, v_start, v_end=None) -> []:
+        """
+        Returns a list of vertices visited during BFS search.
+        Vertices are picked in numerical order.
+        """
 
-        visited = []
+        return list(self._cached('bfs', (v_start, v_end), lambda: list(self.iter_bfs(v_start, v_end))))
+
+    def iter_dfs(self, v_start, v_end=None):
+        """
+        Generator version of dfs(), yields the vertices one at a time in the same order.
+        """
+
+        if v_start >= self.v_count or v_start < 0:
+            return
+
+        visited = bytearray(self.v_count)
         stack = [v_start]
+        skipped = 0
 
-        while stack:
+        try:
+            while stack:
 
-            vertex = stack.pop()
+                vertex = stack.pop()
 
-            if vertex in visited:
-                continue
+                if visited[vertex]:
+                    skipped += 1
+                    continue
 
-            visited.append(vertex)
+                visited[vertex] = 1
+                yield vertex
 
-            if vertex == v_end:
-                return visited
+                if vertex == v_end:
+                    return
 
-            to_stack = []
-            index = 0
+                for element in reversed(self._neighbours(vertex)):
+                    if not visited[element]:
+                        stack.append(element)
 
-            for element in self.adj_matrix[vertex]:
-                if element != 0:
-                    to_stack.append(index)
-                index += 1
+        finally:
+            if self._stats is not None:
+                pops = visited.count(1) + skipped
+                self._count_search(visited, pops + len(stack), pops)
 
-            to_stack.sort(reverse=True)
+    def iter_bfs(self, v_start, v_end=None):
+        """
+        Generator version of bfs(), yields the vertices one at a time in the same order.
+        """
 
-            for element in to_stack:
-                if element != vertex and element not in visited:
-                    stack.append(element)
+        if v_start >= self.v_count or v_start < 0:
+            return
 
-        return visited
+        # vertices are marked when queued, which visits them in the same order as marking them when dequeued
+        visited = bytearray(self.v_count)
+        visited[v_start] = 1
+        queue = deque([v_start])
 
-    def bfs(self, v_start, v_end=None) -> []:
+        try:
+            while queue:
+
+                vertex = queue.popleft()
+                yield vertex
+
+                if vertex == v_end:
+                    return
+
+                for element in self._neighbours(vertex):
+                    if not visited[element]:
+                        visited[element] = 1
+                        queue.append(element)
+
+        finally:
+            if self._stats is not None:
+                # every marked vertex was queued once, the ones still queued were never expanded
+                pushes = visited.count(1)
+                self._count_search(visited, pushes, pushes - len(queue), queue)
+
+    def adfs(self, v_start, v_end=None, every=ASYNC_YIELD_EVERY, timeout=None):
         """
-        Returns a list of vertices visited during BFS search.
-        Vertices are picked in numerical order.
+        Async iterator version of dfs() for use inside asyncio code. It yields the vertices in the same order
+        and returns to the event loop after every "every" vertices, so other tasks keep running and the search
+        can be cancelled there. Raises asyncio.TimeoutError if it runs for more than "timeout" seconds.
+        The search runs on a frozen copy of the graph, so changes made while it is paused do not affect it.
+        """
+
+        return cooperative(self.freeze().iter_dfs(v_start, v_end), every, timeout)
+
+    def abfs(self, v_start, v_end=None, every=ASYNC_YIELD_EVERY, timeout=None):
+        """
+        Async iterator version of bfs(), behaving like adfs().
+        """
+
+        return cooperative(self.freeze().iter_bfs(v_start, v_end), every, timeout)
+
+    def has_cycle(self):
+        """
+        Returns True if the graph is cyclic, False if it is acyclic.
+        """
+
+        return len(self.find_cycle()) > 0
+
+    def find_cycle(self) -> []:
+        """
+        Returns a list of vertices forming a cycle, starting and ending with the same vertex.
+        Returns an empty list if the graph is acyclic.
+        """
+
+        _, cycle = self._colour_dfs()
+
+        return cycle
+
+    def topological_sort(self) -> []:
+        """
+        Returns a list of all vertices ordered so that every edge goes from an earlier to a later vertex.
+        Returns None if the graph is cyclic, as no such order exists.
+        """
+
+        order, cycle = self._colour_dfs()
+
+        if cycle:
+            return None
+
+        return order
+
+    def to_numpy(self):
+        """
+        Returns the adjacency matrix as a read-only NumPy array of weights, 0 meaning no edge.
+        The array is cached until the next change to the graph. Requires NumPy.
+        """
+
+        if numpy is None:
+            raise ImportError('DirectedGraph.to_numpy() requires NumPy')
+
+        if self._ndarray is None:
+            offsets, indices, weights = self.to_csr()
+            matrix = numpy.zeros((self.v_count, self.v_count), dtype='int64' if weights.typecode == 'q' else 'float64')
+            rows = numpy.repeat(numpy.arange(self.v_count), numpy.diff(numpy.asarray(offsets, dtype='int64')))
+            matrix[rows, numpy.asarray(indices, dtype='int64')] = weights
+            matrix.flags.writeable = False
+            self._ndarray = matrix
+
+        return self._ndarray
+
+    def bfs_levels(self, v_start, dense=False) -> []:
+        """
+        Returns the vertices reachable from "v_start" grouped by their BFS level, a list of lists
+        where level 0 is [v_start] and every level is in numerical order.
+        With "dense" and NumPy installed each level is expanded as a single boolean operation on the V x V
+        adjacency matrix, which pays off on small dense graphs, otherwise the sparse rows are walked.
         """
 
-        if v_start > self.v_count or v_start < 0:
+        if v_start >= self.v_count or v_start < 0:
             return []
 
-        visited = []
-        queue = [v_start]
+        if not dense or numpy is None:
+            levels = []
+            level = [v_start]
+            visited = bytearray(self.v_count)
+            visited[v_start] = 1
 
-        while queue:
+            while level:
+                levels.append(level)
+                level = []
 
-            vertex = queue.pop(0)
+                for vertex in levels[-1]:
+                    for element in self._out[vertex]:
+                        if not visited[element]:
+                            visited[element] = 1
+                            level.append(element)
 
-            if vertex in visited:
-                continue
+                level.sort()
 
-            visited.append(vertex)
+            return levels
 
-            if vertex == v_end:
-                return visited
+        adjacency = self._numpy_adjacency()
+        frontier = numpy.zeros(self.v_count, dtype=bool)
+        frontier[v_start] = True
+        visited = frontier.copy()
+        levels = []
 
-            to_queue = []
-            index = 0
+        while frontier.any():
+            levels.append(numpy.flatnonzero(frontier).tolist())
+            frontier = adjacency[frontier].any(axis=0) & ~visited
+            visited |= frontier
 
-            for element in self.adj_matrix[vertex]:
-                if element != 0:
-                    to_queue.append(index)
-                index += 1
+        return levels
 
-            to_queue.sort()
+    def reachable(self, sources, dense=False) -> []:
+        """
+        Returns a list, in numerical order, of every vertex that can be reached from at least one of the
+        "sources", the sources included. Vertices that are not in the graph are ignored.
+        With "dense" and NumPy installed the search runs on the adjacency matrix as in bfs_levels().
+        """
 
-            for element in to_queue:
-                if element != vertex and element not in visited:
-                    queue.append(element)
+        sources = [src for src in sources if 0 <= src < self.v_count]
 
-        return visited
+        if not dense or numpy is None:
+            visited = set(sources)
+            stack = list(sources)
 
-    def has_cycle(self):
+            while stack:
+                for element in self._out[stack.pop()]:
+                    if element not in visited:
+                        visited.add(element)
+                        stack.append(element)
+
+            return sorted(visited)
+
+        adjacency = self._numpy_adjacency()
+        frontier = numpy.zeros(self.v_count, dtype=bool)
+        frontier[sources] = True
+        visited = frontier.copy()
+
+        while frontier.any():
+            frontier = adjacency[frontier].any(axis=0) & ~visited
+            visited |= frontier
+
+        return numpy.flatnonzero(visited).tolist()
+
+    def transitive_closure(self, dense=False) -> []:
         """
-        Returns True if the graph is cyclic, False if it is acyclic.
+        Returns a list holding, for every vertex "v", the list of vertices reachable from "v"
+        in numerical order, "v" included (the same vertices as bfs(v)).
+        With "dense" and NumPy installed the closure is computed by repeated squaring of the boolean
+        reachability matrix, otherwise by a search from every vertex.
+        """
+
+        if not dense or numpy is None:
+            return [sorted(self.iter_bfs(vertex)) for vertex in range(self.v_count)]
+
+        closure = self._numpy_adjacency() | numpy.eye(self.v_count, dtype=bool)
+
+        while True:
+            # float32 products keep the matrix multiplication on BLAS, any positive entry is a path
+            step = (closure.astype('float32') @ closure.astype('float32')) > 0
+
+            if numpy.array_equal(step, closure):
+                break
+
+            closure = step
+
+        return [numpy.flatnonzero(row).tolist() for row in closure]
+
+    def predecessors(self, v: int) -> []:
+        """
+        Returns a list of the vertices with an edge to "v", in numerical order.
+        If the input is invalid returns an empty list.
         """
 
-        vertices = self.get_vertices()
+        if v < 0 or v >= self.v_count:
+            return []
+
+        return sorted(self._reverse()[v])
 
-        while vertices:
+    def in_degree(self, v: int) -> int:
+        """
+        Returns the number of edges ending at "v". If the input is invalid returns None.
+        """
 
-            vertex = vertices.pop()
-            connects = []
-            index = 0
+        if v < 0 or v >= self.v_count:
+            return None
 
-            for element in self.adj_matrix[vertex]:
-                if element != 0:
-                    connects.append(index)
-                index += 1
+        return len(self._reverse()[v])
 
-            for element in connects:
-                route = self.dfs(element)
+    def out_degree(self, v: int) -> int:
+        """
+        Returns the number of edges starting at "v". If the input is invalid returns None.
+        """
 
-                if vertex in route:
-                    return True
+        if v < 0 or v >= self.v_count:
+            return None
 
-        return False
+        return len(self._out[v])
 
-    def dijkstra(self, src: int) -> []:
+    def dijkstra(self, src: int, target=None) -> []:
         """
         Uses Dijkstra's algorithm to determine the shortest possible path to any vertex from the provided source vertex.
         Returns a list of the "distance" required to reach each vertex in the order provided by the get_vertices fxn.
         If it is impossible to reach a certain vertex, its "distance" is represented by "inf".
+        If a "target" vertex is provided the search stops as soon as it is settled, so only the distances
+        of vertices settled before it are guaranteed to be final.
         """
 
-        table = dict()
-        weights = []
-        vertices = self.get_vertices()
-        visited = []
-        queue = [src]
-
-        for element in vertices:
-            table[element] = [float('inf'), None]
-
-        if src in table:
-            table[src] = [0, None]
-
-        while queue:
-
-            vertex = queue.pop(0)
-            visited.append(vertex)
-            vertex_weights = self.adj_matrix[vertex]
-            index = 0
-
-            for element in vertex_weights:
-                if element != 0:
-                    if table[index][0] > element + table[vertex][0]:
-                        table[index][0] = element + table[vertex][0]
-                        table[index][1] = vertex
-                        for pair in table:
-                            if table[pair][1] == index:
-                                table[pair][0] = table[index][0] + self.adj_matrix[index][pair]
-                    if index not in visited:
-                        queue.append(index)
-                index += 1
-
-        for element in table:
-            weights.append(table[element][0])
-
-        return weights
+        if target is None and self._trees and src in self._trees:
+            return list(self._trees[src].distances)
+
+        distances = self._cached('dijkstra', (src, target), lambda: self._dijkstra(src, target)[0])
+
+        return list(distances)
+
+    def iter_dijkstra(self, src: int):
+        """
+        Generator version of dijkstra(), yields a (vertex, distance) tuple for every vertex that can be
+        reached from "src" as soon as its distance is final, in order of increasing distance.
+        """
+
+        if src < 0 or src >= self.v_count:
+            return
+
+        inf = float('inf')
+        distances = {src: 0}
+        heap = [(0, src)]
+        stale = 0
+
+        try:
+            while heap:
+
+                distance, vertex = heapq.heappop(heap)
+
+                # stale heap entry, the vertex was already settled with a shorter distance
+                if distance > distances[vertex]:
+                    stale += 1
+                    continue
+
+                yield vertex, distance
+
+                for neighbour, weight in self._out[vertex].items():
+                    if distance + weight < distances.get(neighbour, inf):
+                        distances[neighbour] = distance + weight
+                        heapq.heappush(heap, (distances[neighbour], neighbour))
+
+        finally:
+            if self._stats is not None:
+                self._count_heap_search(self._out, distances, heap, stale)
+
+    def adijkstra(self, src: int, every=ASYNC_YIELD_EVERY, timeout=None):
+        """
+        Async iterator version of iter_dijkstra(), streaming (vertex, distance) tuples as vertices are settled.
+        Returns to the event loop after every "every" vertices and raises asyncio.TimeoutError if it runs for
+        more than "timeout" seconds, like adfs(). The search runs on a frozen copy of the graph.
+        """
+
+        return cooperative(self.freeze().iter_dijkstra(src), every, timeout)
+
+    def track_source(self, src: int) -> None:
+        """
+        Registers "src" as a tracked source. Its shortest path distances and tree are computed once and from
+        then on repaired after every add_edge() and remove_edge() instead of being recomputed, so dijkstra(src)
+        and tracked_path(src, dst) answer straight from them. Bulk edge changes rebuild the tracked trees.
+        If the input is invalid returns None.
+        """
+
+        if src < 0 or src >= self.v_count:
+            return None
+
+        if self._trees is None:
+            self._trees = dict()
+
+        if src not in self._trees:
+            self._trees[src] = _ShortestPathTree(src, *self._dijkstra(src))
+
+        return None
+
+    def untrack_source(self, src: int) -> None:
+        """
+        Stops maintaining the shortest paths of a source registered with track_source().
+        """
+
+        if self._trees:
+            self._trees.pop(src, None)
+
+        return None
+
+    def tracked_path(self, src: int, dst: int) -> []:
+        """
+        Returns a list of the vertices along a shortest path from a tracked source "src" to "dst", read from
+        the maintained shortest path tree. Returns an empty list if "dst" cannot be reached or "src" is not tracked.
+        """
+
+        if not self._trees or src not in self._trees or not 0 <= dst < self.v_count:
+            return []
+
+        return self._trees[src].path(dst)
+
+    def dijkstra_path(self, src: int, dst: int) -> []:
+        """
+        Returns a list of the vertices along a shortest path from "src" to "dst", both included.
+        If "dst" cannot be reached from "src" an empty list is returned.
+        """
+
+        distances, predecessors = self._dijkstra(src, dst)
+
+        if dst < 0 or dst >= self.v_count or distances[dst] == float('inf'):
+            return []
+
+        path = [dst]
+
+        while path[-1] != src:
+            path.append(predecessors[path[-1]])
+
+        path.reverse()
+
+        return path
+
+    def shortest_path(self, src: int, dst: int) -> ([], float):
+        """
+        Returns a tuple (path, distance) for a shortest path from "src" to "dst", where path is the list of
+        vertices from "src" to "dst" and distance the sum of its weights. Returns ([], inf) if "dst" cannot
+        be reached. Runs a bidirectional Dijkstra, searching forward from "src" and backward from "dst" over
+        the reverse edges until the two searches meet, which settles far fewer vertices than dijkstra().
+        """
+
+        path, distance = self._cached('shortest_path', (src, dst), lambda: self._bidirectional_dijkstra(src, dst))
+
+        return list(path), distance
+
+    def _bidirectional_dijkstra(self, src: int, dst: int) -> ([], float):
+        """
+        Bidirectional Dijkstra behind shortest_path(), returns the same (path, distance) tuple.
+        """
+
+        inf = float('inf')
+
+        if not 0 <= src < self.v_count or not 0 <= dst < self.v_count:
+            return [], inf
+
+        if src == dst:
+            return [src], 0
+
+        # index 0 holds the forward search from src, index 1 the backward search from dst
+        adjacency = (self._out, self._reverse())
+        distances = ({src: 0}, {dst: 0})
+        parents = ({src: None}, {dst: None})
+        heaps = ([(0, src)], [(0, dst)])
+        best = inf
+        meeting = None
+        stale = [0, 0]
+
+        while heaps[0] and heaps[1]:
+
+            # no path through a vertex that is not settled yet can beat the best one found
+            if heaps[0][0][0] + heaps[1][0][0] >= best:
+                break
+
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            distance, vertex = heapq.heappop(heaps[side])
+
+            if distance > distances[side][vertex]:
+                stale[side] += 1
+                continue
+
+            for element, weight in adjacency[side][vertex].items():
+                candidate = distance + weight
+
+                if candidate < distances[side].get(element, inf):
+                    distances[side][element] = candidate
+                    parents[side][element] = vertex
+                    heapq.heappush(heaps[side], (candidate, element))
+
+                if element in distances[1 - side] and candidate + distances[1 - side][element] < best:
+                    best = candidate + distances[1 - side][element]
+                    meeting = element
+
+        if self._stats is not None:
+            for side in (0, 1):
+                self._count_heap_search(adjacency[side], distances[side], heaps[side], stale[side])
+
+        if meeting is None:
+            return [], inf
+
+        path = []
+        vertex = meeting
+
+        while vertex is not None:
+            path.append(vertex)
+            vertex = parents[0][vertex]
+
+        path.reverse()
+        vertex = parents[1][meeting]
+
+        while vertex is not None:
+            path.append(vertex)
+            vertex = parents[1][vertex]
+
+        return path, best
+
+    def dijkstra_many(self, sources, workers=None):
+        """
+        Runs dijkstra() from every vertex in "sources" and yields (source, distances) tuples as the
+        searches complete, so results may come out in a different order than the sources.
+        With more than one worker the searches are spread over a process pool, unless there is less than
+        PARALLEL_DIJKSTRA_MIN_WORK of it, counted as sources * (V + E). The workers all read the
+        graph from one shared memory copy of its CSR arrays rather than a pickled copy per task.
+        The number of workers defaults to the number of CPUs.
+        """
+
+        sources = list(sources)
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        if (workers <= 1 or len(sources) <= 1
+                or len(sources) * (self.v_count + sum(len(row) for row in self._out)) < PARALLEL_DIJKSTRA_MIN_WORK):
+            for src in sources:
+                yield src, self.dijkstra(src)
+            return
+
+        blocks, layout = share_arrays(self.to_csr())
+        chunk = max(1, len(sources) // (workers * 4))
+        executor = ProcessPoolExecutor(workers, initializer=_attach_csr, initargs=(layout,))
+
+        try:
+            tasks = [executor.submit(_dijkstra_chunk, sources[start:start + chunk])
+                     for start in range(0, len(sources), chunk)]
+
+            for task in as_completed(tasks):
+                yield from task.result()
+
+        finally:
+            executor.shutdown(cancel_futures=True)
+            release(blocks)
+
+    def all_pairs_shortest_paths(self, workers=None) -> []:
+        """
+        Returns a list holding the dijkstra() distance list of every vertex, in vertex order.
+        Small dense graphs are solved in this process with a NumPy Floyd-Warshall when NumPy is installed,
+        all other graphs with dijkstra_many() using the given number of workers.
+        """
+
+        edge_count = sum(len(row) for row in self._out)
+
+        if numpy is not None and self.v_count <= FLOYD_WARSHALL_MAX_VERTICES and 4 * edge_count >= self.v_count ** 2:
+            return self._floyd_warshall()
+
+        distances = [None] * self.v_count
+
+        for src, row in self.dijkstra_many(range(self.v_count), workers):
+            distances[src] = row
+
+        return distances
+
+    def _dijkstra(self, src: int, target=None) -> ([], []):
+        """
+        Binary heap implementation of Dijkstra's algorithm, O((V + E) log V).
+        Returns a tuple of two lists indexed by vertex: the distance from "src" and the predecessor
+        of each vertex on its shortest path (None for the source and for unreachable vertices).
+        """
+
+        distances = [float('inf')] * self.v_count
+        predecessors = [None] * self.v_count
+
+        if src < 0 or src >= self.v_count:
+            return distances, predecessors
+
+        distances[src] = 0
+        heap = [(0, src)]
+        stale = 0
+
+        while heap:
+
+            distance, vertex = heapq.heappop(heap)
+
+            # stale heap entry, the vertex was already settled with a shorter distance
+            if distance > distances[vertex]:
+                stale += 1
+                continue
+
+            if vertex == target:
+                break
+
+            for neighbour, weight in self._out[vertex].items():
+                if distance + weight < distances[neighbour]:
+                    distances[neighbour] = distance + weight
+                    predecessors[neighbour] = vertex
+                    heapq.heappush(heap, (distances[neighbour], neighbour))
+
+        if self._stats is not None:
+            reached = {vertex: distance for vertex, distance in enumerate(distances) if distance < float('inf')}
+            self._count_heap_search(self._out, reached, heap, stale, target if target in reached else None)
+
+        return distances, predecessors
+
+    def _floyd_warshall(self) -> []:
+        """
+        Floyd-Warshall over a NumPy matrix, relaxing a whole matrix through one vertex per step.
+        Returns the same distance lists as calling dijkstra() from every vertex.
+        """
+
+        matrix = numpy.full((self.v_count, self.v_count), float('inf'))
+
+        for src, row in enumerate(self._out):
+            for dst, weight in row.items():
+                matrix[src, dst] = weight
+
+        numpy.fill_diagonal(matrix, 0)
+
+        for through in range(self.v_count):
+            numpy.minimum(matrix, matrix[:, through, None] + matrix[through], out=matrix)
+
+        distances = matrix.tolist()
+
+        # NumPy works in floats, give integer weighted graphs back the integers dijkstra() returns
+        if all(isinstance(weight, int) for row in self._out for weight in row.values()):
+            distances = [[int(value) if value != float('inf') else value for value in row] for row in distances]
+
+        return distances
+
+    def to_csr(self) -> (array, array, array):
+        """
+        Returns the graph in compressed sparse row form as a tuple of three arrays (offsets, indices, weights).
+        The out-edges of vertex "v" are indices[offsets[v]:offsets[v + 1]] in numerical order,
+        with the matching weights at the same positions.
+        """
+
+        offsets = array('q', [0])
+        indices = array('q')
+        weights = []
+
+        for source in range(self.v_count):
+            row = self._out[source]
+
+            for destination in self._neighbours(source):
+                indices.append(destination)
+                weights.append(row[destination])
+
+            offsets.append(len(indices))
+
+        if all(isinstance(weight, int) for weight in weights):
+            return offsets, indices, array('q', weights)
+
+        return offsets, indices, array('d', weights)
+
+    @classmethod
+    def from_csr(cls, offsets, indices, weights) -> 'DirectedGraph':
+        """
+        Builds a DirectedGraph from compressed sparse row arrays as returned by to_csr().
+        Any sequences supporting len() and slicing can be used for the three arguments. The rows are
+        read from them on first use, so the arrays must not be changed after the call.
+        """
+
+        graph = cls()
+        graph._out = _CSRRows(offsets, indices, weights)
+        graph._sorted = [None] * len(graph._out)
+        graph.v_count = len(graph._out)
+
+        return graph
+
+    def save(self, path: str) -> None:
+        """
+        Writes the graph to "path" in the binary snapshot format read by load(): a fixed header
+        followed by the CSR offsets, indices and weights arrays in native byte order.
+        """
+
+        offsets, indices, weights = self.to_csr()
+        header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, sys.byteorder[0].encode(),
+                                      weights.typecode.encode(), self.v_count, len(indices))
+
+        with open(path, 'wb') as file:
+            file.write(header)
+            offsets.tofile(file)
+            indices.tofile(file)
+            weights.tofile(file)
+
+    @classmethod
+    def load(cls, path: str, mmap=True) -> 'DirectedGraph':
+        """
+        Returns the DirectedGraph stored in a snapshot file written by save().
+        With "mmap" the file is memory mapped read-only instead of being read, so opening it costs O(V)
+        whatever the number of edges, and processes loading the same file share its pages.
+        Raises ValueError if the file is not a snapshot this version can read or is truncated.
+        """
+
+        with open(path, 'rb') as file:
+            if mmap:
+                data = memoryview(mmap_module.mmap(file.fileno(), 0, access=mmap_module.ACCESS_READ))
+            else:
+                data = memoryview(file.read())
+
+        if len(data) < SNAPSHOT_HEADER.size:
+            raise ValueError(f'{path} is not a DirectedGraph snapshot')
+
+        magic, version, byteorder, typecode, v_count, e_count = SNAPSHOT_HEADER.unpack_from(data)
+
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f'{path} is not a version {SNAPSHOT_VERSION} DirectedGraph snapshot')
+
+        if byteorder != sys.byteorder[0].encode():
+            raise ValueError(f'{path} was written on a machine with a different byte order')
+
+        if typecode not in (b'q', b'd'):
+            raise ValueError(f'{path} has an unknown weight type {typecode!r}')
+
+        if len(data) != SNAPSHOT_HEADER.size + (v_count + 1 + 2 * e_count) * 8:
+            raise ValueError(f'{path} does not match the sizes in its header, it may be truncated')
+
+        start = SNAPSHOT_HEADER.size
+        arrays = []
+
+        for code, length in (('q', v_count + 1), ('q', e_count), (typecode.decode(), e_count)):
+            end = start + length * 8
+            arrays.append(data[start:end].cast(code))
+            start = end
+
+        graph = cls.from_csr(*arrays)
+
+        # to_csr() stores every weight as a float once one of them is, so integral weights are read back as ints
+        graph._out.integral = typecode == b'd'
+
+        return graph
+
+    @classmethod
+    def from_edge_file(cls, path: str, chunk_size=EDGE_FILE_CHUNK_SIZE, delimiter=None, header=False,
+                       workers=None) -> 'DirectedGraph':
+        """
+        Builds a DirectedGraph from a text file with one "src dst [weight]" edge per line, as written by to_edge_file().
+        Columns are split on "delimiter", by default ',' for .csv files, a tab for .tsv files and any whitespace
+        otherwise, and gzip compressed files are read as they are. With "header" the first line is skipped,
+        blank lines and lines starting with '#' always are. A missing weight is 1.
+        The file is parsed and added through add_edges() "chunk_size" lines at a time, so apart from the graph
+        itself memory use is bounded by the chunk size. With more than one worker the chunks are parsed in a
+        process pool. Edges that add_edges() rejects are left out. Raises ValueError for a malformed line.
+        """
+
+        graph = cls()
+
+        for edges in read_edge_chunks(path, parse_directed_edges, chunk_size, delimiter, header, workers):
+            if edges:
+                top = max(max(src, dst) for src, dst, _ in edges)
+                if top >= graph.v_count:
+                    graph.add_vertices(top + 1 - graph.v_count)
+                graph.add_edges(edges)
+
+        return graph
+
+    def to_edge_file(self, path: str, delimiter=None, header=False) -> None:
+        """
+        Writes the edges to "path" one "src dst weight" line at a time in the format read by from_edge_file(),
+        gzip compressed if the name ends in .gz. With "header" the first line holds the column names.
+        Vertices after the last one with an edge are not recorded.
+        """
+
+        write_edge_file(path, self.iter_edges(), ('src', 'dst', 'weight'), delimiter, header)
+
+    def freeze(self) -> 'DirectedGraph':
+        """
+        Returns a read-only copy of the graph as it is now, whose methods that change the graph raise TypeError.
+        The copy shares the rows of the graph and costs O(V). After it is taken the graph copies a row
+        the first time it changes it, so later changes never show in the copy. A frozen copy can be read
+        from many threads at once without locking while one thread keeps changing the graph.
+        """
+
+        frozen = _FrozenDirectedGraph.__new__(_FrozenDirectedGraph)
+        frozen.v_count = self.v_count
+        frozen._out = self._out.copy()
+        frozen._sorted = list(self._sorted)
+        frozen._in = None if self._in is None else list(self._in)
+        frozen._matrix = self._matrix
+        frozen._ndarray = self._ndarray
+        frozen._boolean = self._boolean
+        frozen._version = self._version
+        self._owned = (set(), set())
+
+        return frozen
+
+    def _colour_dfs(self) -> ([], []):
+        """
+        Three-colour depth first search over the whole graph, O(V + E).
+        Returns a tuple (order, cycle). If a back edge is found the search stops there and
+        cycle holds the vertices of that cycle, otherwise cycle is empty and order holds
+        the vertices in reverse postorder, which is a topological order.
+        """
+
+        white, grey, black = 0, 1, 2
+        colour = [white] * self.v_count
+        postorder = []
+
+        for root in range(self.v_count):
+
+            if colour[root] != white:
+                continue
+
+            colour[root] = grey
+            stack = [(root, iter(self._neighbours(root)))]
+
+            while stack:
+
+                vertex, neighbours = stack[-1]
+
+                for element in neighbours:
+
+                    if colour[element] == white:
+                        colour[element] = grey
+                        stack.append((element, iter(self._neighbours(element))))
+                        break
+
+                    if colour[element] == grey:
+                        path = [entry[0] for entry in stack]
+                        cycle = path[path.index(element):]
+                        cycle.append(element)
+
+                        if self._stats is not None:
+                            self._count_search(colour, len(postorder) + len(stack), len(postorder))
+
+                        return [], cycle
+
+                else:
+                    colour[vertex] = black
+                    postorder.append(vertex)
+                    stack.pop()
+
+        if self._stats is not None:
+            self._count_search(colour, len(postorder), len(postorder))
+
+        postorder.reverse()
+
+        return postorder, []
+
+    def _add_edge_array(self, edges) -> []:
+        """
+        add_edges() for a NumPy array with one (src, dst) or (src, dst, weight) edge per row.
+        Rows of a float array whose ids are not whole numbers are rejected as well.
+        Whole numbers in a float array are stored and reported as ints.
+        """
+
+        if edges.ndim != 2 or edges.shape[1] not in (2, 3):
+            raise ValueError('edge arrays must have two or three columns')
+
+        src = edges[:, 0]
+        dst = edges[:, 1]
+        weight = edges[:, 2] if edges.shape[1] == 3 else numpy.ones(len(edges), dtype='int64')
+        valid = (weight > 0) & (src != dst) & (src >= 0) & (dst >= 0) & (src < self.v_count) & (dst < self.v_count)
+
+        # float ids have to be whole numbers, int() would silently turn 1.5 into vertex 1
+        if edges.dtype.kind == 'f':
+            valid &= (src == numpy.trunc(src)) & (dst == numpy.trunc(dst))
+
+        rows = self._out
+        order = self._sorted
+        columns = self._in
+        owned = self._owned
+        values = weight[valid].tolist()
+        rejected = edges[~valid].tolist()
+
+        # whole numbers in a float array are kept as ints, like the ids, so one float row does not
+        # turn every weight of the graph into a float in to_csr() and save()
+        if edges.dtype.kind == 'f':
+            values = [int(value) if value.is_integer() else value for value in values]
+            rejected = [[int(item) if item.is_integer() else item for item in edge] for edge in rejected]
+
+        for source, destination, value in zip(src[valid].astype('int64').tolist(),
+                                              dst[valid].astype('int64').tolist(), values):
+            if owned is not None:
+                self._unshare(source, destination)
+            rows[source][destination] = value
+            order[source] = None
+            if columns is not None:
+                columns[destination][source] = value
+
+        self._changed()
+        self._rebuild_trees()
+
+        return [tuple(edge) for edge in rejected]
+
+    def _edge_updated(self, src: int, dst: int, old_weight, new_weight) -> None:
+        """
+        Repairs the tracked shortest path trees after the weight of the edge from "src" to "dst" went from
+        "old_weight" to "new_weight", None meaning that the edge did not or no longer exists.
+        """
+
+        if not self._trees:
+            return None
+
+        for tree in self._trees.values():
+            if old_weight is None or (new_weight is not None and new_weight < old_weight):
+                tree.edge_decreased(self._out, src, dst, new_weight)
+            elif new_weight is None or new_weight > old_weight:
+                tree.edge_increased(self._out, self._reverse(), src, dst)
+
+        return None
+
+    def _rebuild_trees(self) -> None:
+        """
+        Recomputes every tracked shortest path tree from scratch, used after bulk changes.
+        """
+
+        if not self._trees:
+            return None
+
+        for src in list(self._trees):
+            if src < self.v_count:
+                self._trees[src] = _ShortestPathTree(src, *self._dijkstra(src))
+            else:
+                del self._trees[src]
+
+        return None
+
+    def _unshare(self, src: int, dst: int) -> None:
+        """
+        Replaces the out row of "src" and the in row of "dst" by copies of their own the first time they
+        are changed after freeze(), so the frozen copy that shares them keeps the old rows.
+        """
+
+        owned_out, owned_in = self._owned
+
+        if src not in owned_out:
+            self._out[src] = dict(self._out[src])
+            owned_out.add(src)
+
+        if self._in is not None and dst not in owned_in:
+            self._in[dst] = dict(self._in[dst])
+            owned_in.add(dst)
+
+    def _reverse(self) -> []:
+        """
+        Returns the in-edge index, a list holding a dict (source -> weight) of the in-edges of every vertex.
+        It is built from the sparse rows on first use and then kept up to date by every change to the graph.
+        """
+
+        if self._in is None:
+            columns = [dict() for _ in range(self.v_count)]
+
+            for src, row in enumerate(self._out):
+                for dst, weight in row.items():
+                    columns[dst][src] = weight
+
+            self._in = columns
+
+        return self._in
+
+    def _numpy_adjacency(self):
+        """
+        Returns the boolean NumPy adjacency matrix, cached until the next change to the graph.
+        """
+
+        if self._boolean is None:
+            self._boolean = self.to_numpy() != 0
+
+        return self._boolean
+
+    def cache_stats(self) -> dict:
+        """
+        Returns the hit and miss counts and the size of the query cache that memoises dfs(), bfs(),
+        dijkstra() and shortest_path() results between changes to the graph.
+        """
+
+        return self._query_cache().stats()
+
+    def enable_stats(self, callback=None) -> GraphStats:
+        """
+        Starts counting the vertices expanded, edges relaxed, queue pushes and pops and query cache
+        lookups of the searches, and timing the public methods. Returns the GraphStats that collects them.
+        If a callback is given it is called as callback(method, seconds, stats) after every timed call.
+        Graphs without stats enabled pay nothing for the instrumentation.
+        """
+
+        self.disable_stats()
+        self._stats = GraphStats(callback)
+        self._stats.attach(self, self._TIMED_METHODS)
+
+        return self._stats
+
+    def disable_stats(self) -> GraphStats:
+        """
+        Stops collecting stats and returns what was collected, or None if stats were not enabled.
+        """
+
+        stats = self._stats
+
+        if stats is not None:
+            stats.detach(self, self._TIMED_METHODS)
+            self._stats = None
+
+        return stats
+
+    def get_stats(self) -> GraphStats:
+        """
+        Returns the GraphStats collected since enable_stats(), or None if stats are not enabled.
+        """
+
+        return self._stats
+
+    def _cached(self, method: str, args: tuple, compute):
+        """
+        Returns the result of compute() for a query, memoised under the current graph version.
+        """
+
+        cache = self._query_cache()
+
+        if self._stats is None:
+            return cache.get((method, args, self._version), compute)
+
+        hits, misses = cache.hits, cache.misses
+        value = cache.get((method, args, self._version), compute)
+        self._stats.cache_hits += cache.hits - hits
+        self._stats.cache_misses += cache.misses - misses
+
+        return value
+
+    def _query_cache(self) -> QueryCache:
+        """
+        Returns the query cache of the graph, creating it on first use.
+        """
+
+        if self._cache is None:
+            self._cache = QueryCache()
+
+        return self._cache
+
+    def _changed(self) -> None:
+        """
+        Bumps the graph version and drops the matrix views derived from the sparse rows,
+        called after every change to the graph.
+        """
+
+        self._version += 1
+        self._matrix = None
+        self._ndarray = None
+        self._boolean = None
+
+    def _count_search(self, visited, pushes: int, pops: int, pending=()) -> None:
+        """
+        Adds a search that marked the vertices set in "visited" to the stats. The "pending" vertices
+        were marked but never expanded, so their edges are not counted.
+        """
+
+        pending = set(pending)
+        expanded = [vertex for vertex, mark in enumerate(visited) if mark and vertex not in pending]
+        self._stats.count(len(expanded), sum(len(self._out[vertex]) for vertex in expanded), pushes, pops)
+
+    def _count_heap_search(self, rows, distances: dict, heap: [], stale: int, stopped=None) -> None:
+        """
+        Adds a Dijkstra search to the stats, worked out from the vertices it reached, the heap it left
+        and its number of stale heap entries so the search loop itself needs no counters.
+        A reached vertex is expanded unless its current entry is still on the heap or it is the
+        "stopped" vertex whose pop ended the search.
+        """
+
+        pending = {vertex for distance, vertex in heap if distance == distances[vertex]}
+
+        if stopped is not None:
+            pending.add(stopped)
+
+        expanded = [vertex for vertex in distances if vertex not in pending]
+        pops = len(expanded) + stale + (stopped is not None)
+        self._stats.count(len(expanded), sum(len(rows[vertex]) for vertex in expanded), pops + len(heap), pops)
+
+    def _neighbours(self, vertex: int) -> []:
+        """
+        Returns the out-neighbours of a vertex in numerical order. The list is sorted once and kept
+        until an edge of the vertex is added or removed, callers must not change it.
+        """
+
+        order = self._sorted[vertex]
+
+        if order is None:
+            order = self._sorted[vertex] = sorted(self._out[vertex])
+
+        return order
+
+
+class _FrozenDirectedGraph(DirectedGraph):
+    """
+    Read-only DirectedGraph returned by DirectedGraph.freeze(). The queries work as usual and cache their
+    results in the copy, every method that would change the graph raises TypeError.
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('a frozen DirectedGraph cannot be changed')
+
+    def freeze(self) -> 'DirectedGraph':
+        return self
+
+    add_vertex = add_vertices = add_edge = remove_edge = add_edges = remove_edges = _read_only
+    track_source = untrack_source = _read_only
+
+    adj_matrix = property(DirectedGraph.adj_matrix.fget, _read_only, doc=DirectedGraph.adj_matrix.__doc__)
+
+
+# ---------------------------------------------------------------------- #
+# process pool helpers for DirectedGraph.dijkstra_many()
+
+# CSR arrays of the graph being searched, attached once per worker process
+_shared_csr = None
+
+
+def _attach_csr(layout: []) -> None:
+    """
+    Worker initializer, maps the shared CSR arrays described by (name, typecode, length) tuples.
+    """
+
+    global _shared_csr
+
+    # the blocks are kept alongside the views so they stay open for the life of the worker
+    _shared_csr = attach_arrays(layout)
+
+
+def _dijkstra_chunk(sources: []) -> []:
+    """
+    Worker task, returns a list of (source, distances) tuples for the given sources.
+    """
+
+    offsets, indices, weights = _shared_csr[1]
+
+    return [(src, _csr_dijkstra(offsets, indices, weights, src)) for src in sources]
+
+
+def _csr_dijkstra(offsets, indices, weights, src: int) -> []:
+    """
+    Binary heap Dijkstra over compressed sparse row arrays, returns the same list as DirectedGraph.dijkstra().
+    """
+
+    v_count = len(offsets) - 1
+    distances = [float('inf')] * v_count
+
+    if src < 0 or src >= v_count:
+        return distances
+
+    distances[src] = 0
+    heap = [(0, src)]
+
+    while heap:
+
+        distance, vertex = heapq.heappop(heap)
+
+        if distance > distances[vertex]:
+            continue
+
+        for position in range(offsets[vertex], offsets[vertex + 1]):
+            neighbour = indices[position]
+
+            if distance + weights[position] < distances[neighbour]:
+                distances[neighbour] = distance + weights[position]
+                heapq.heappush(heap, (distances[neighbour], neighbour))
+
+    return distances
 
 
 if __name__ == '__main__':
@@ -0,0 +1,215 @@
+# Course: CS261 Data Structures
+# Author: Christopher Wilkie
+# Assignment: DirectedGraph / UndirectedGraph
+# Description: Streaming, chunked reading and writing of CSV, TSV and whitespace separated edge list files
+
+import csv
+import gzip
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+# number of lines parsed and added to the graph at a time by from_edge_file()
+EDGE_FILE_CHUNK_SIZE = 100000
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def edge_delimiter(path: str, delimiter=None):
+    """
+    Returns the column delimiter of an edge file: "delimiter" if one is given, otherwise ',' for .csv files,
+    a tab for .tsv files (with or without .gz) and None, meaning any whitespace, for everything else.
+    """
+
+    if delimiter is not None:
+        return delimiter
+
+    name = path[:-3] if path.endswith('.gz') else path
+
+    if name.endswith('.csv'):
+        return ','
+
+    if name.endswith('.tsv'):
+        return '\t'
+
+    return None
+
+
+def open_edge_file(path: str, mode: str):
+    """
+    Opens an edge file as text for reading ('r') or writing ('w'). Files that start with the gzip magic
+    bytes are decompressed while reading, and files named *.gz are compressed while writing.
+    """
+
+    if mode == 'r':
+        with open(path, 'rb') as file:
+            compressed = file.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+    else:
+        compressed = path.endswith('.gz')
+
+    if compressed:
+        return gzip.open(path, mode + 't', newline='')
+
+    return open(path, mode, newline='')
+
+
+def split_lines(lines: [], delimiter, first: int):
+    """
+    Yields (line number, fields) for every line that is not blank or a '#' comment, counting lines from "first".
+    """
+
+    if delimiter is None:
+        rows = (line.split() for line in lines)
+    else:
+        rows = csv.reader(lines, delimiter=delimiter)
+
+    for number, fields in enumerate(rows, first):
+        if fields and fields[0] and not fields[0].startswith('#'):
+            yield number, fields
+
+
+def parse_number(text: str):
+    """
+    Returns "text" as an int, or as a float if it is not an integer.
+    """
+
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def parse_directed_edges(lines: [], delimiter, first: int) -> []:
+    """
+    Returns the (src, dst, weight) edges of a chunk of lines, the weight defaults to 1 when the third
+    column is missing and further columns are ignored. Raises ValueError naming the line of a malformed edge.
+    """
+
+    edges = []
+
+    for number, fields in split_lines(lines, delimiter, first):
+        try:
+            weight = parse_number(fields[2]) if len(fields) > 2 else 1
+            edges.append((int(fields[0]), int(fields[1]), weight))
+        except (ValueError, IndexError):
+            raise ValueError(f'line {number}: {fields!r} is not a src, dst[, weight] edge') from None
+
+    return edges
+
+
+def parse_undirected_edges(lines: [], delimiter, first: int) -> []:
+    """
+    Returns the (u, v) edges of a chunk of lines, further columns such as weights are ignored.
+    Raises ValueError naming the line of a malformed edge.
+    """
+
+    edges = []
+
+    for number, fields in split_lines(lines, delimiter, first):
+        if len(fields) < 2:
+            raise ValueError(f'line {number}: {fields!r} is not a u, v edge')
+
+        edges.append((fields[0].strip(), fields[1].strip()))
+
+    return edges
+
+
+def read_edge_chunks(path: str, parse, chunk_size=EDGE_FILE_CHUNK_SIZE, delimiter=None, header=False,
+                     workers=None):
+    """
+    Yields the edges of an edge file as lists parsed by parse(lines, delimiter, first line number),
+    one list per "chunk_size" lines, so only a few chunks are ever held in memory.
+    With "header" the first line is skipped. With more than one worker the chunks are parsed in a process pool,
+    keeping at most two chunks per worker in flight, and are still yielded in file order.
+    Raises ValueError naming the file and line of a malformed edge.
+    """
+
+    delimiter = edge_delimiter(path, delimiter)
+
+    try:
+        yield from _read_edge_chunks(path, parse, chunk_size, delimiter, header, workers)
+    except ValueError as error:
+        raise ValueError(f'{path}, {error}') from None
+
+
+def _read_edge_chunks(path: str, parse, chunk_size: int, delimiter, header: bool, workers):
+    """
+    Body of read_edge_chunks(), with the delimiter already picked.
+    """
+
+    with open_edge_file(path, 'r') as file:
+
+        first = 1
+
+        if header:
+            next(file, None)
+            first = 2
+
+        def chunks():
+            number = first
+            while True:
+                lines = list(islice(file, chunk_size))
+                if not lines:
+                    return
+                yield lines, number
+                number += len(lines)
+
+        if workers is None or workers <= 1:
+            for lines, number in chunks():
+                yield parse(lines, delimiter, number)
+            return
+
+        with ProcessPoolExecutor(workers) as pool:
+            pending = deque()
+
+            for lines, number in chunks():
+                pending.append(pool.submit(parse, lines, delimiter, number))
+
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+
+
+def check_vertex_name(name: str, delimiter) -> None:
+    """
+    Raises ValueError if a vertex name would not read back unchanged from an edge file with the given
+    delimiter: names that are empty, start with '#', hold a line break or start or end with whitespace,
+    and names holding any whitespace in whitespace separated files. Names holding the delimiter of a
+    CSV or TSV file are quoted by the writer and read back as they are.
+    """
+
+    if not name or name != name.strip():
+        raise ValueError(f'vertex name {name!r} is empty or starts or ends with whitespace')
+
+    if name.startswith('#'):
+        raise ValueError(f'vertex name {name!r} starts with "#", which marks a comment line')
+
+    if '\n' in name or '\r' in name:
+        raise ValueError(f'vertex name {name!r} holds a line break')
+
+    if delimiter is None and len(name.split()) > 1:
+        raise ValueError(f'vertex name {name!r} holds whitespace, which separates the columns of this file')
+
+
+def write_edge_file(path: str, edges, columns: [], delimiter=None, header=False) -> None:
+    """
+    Writes an iterable of edge tuples to "path" one line at a time, compressed if the name ends in .gz.
+    The delimiter is picked as in edge_delimiter() and whitespace files use a single space.
+    With "header" the first line holds the column names.
+    """
+
+    delimiter = edge_delimiter(path, delimiter)
+
+    with open_edge_file(path, 'w') as file:
+
+        if delimiter is None:
+            if header:
+                file.write(' '.join(columns) + '\n')
+            file.writelines(' '.join(map(str, edge)) + '\n' for edge in edges)
+        else:
+            writer = csv.writer(file, delimiter=delimiter, lineterminator='\n')
+            if header:
+                writer.writerow(columns)
+            writer.writerows(edges)
@@ -0,0 +1,105 @@
+# Course: CS261 Data Structures
+# Author: Christopher Wilkie
+# Assignment: DirectedGraph / UndirectedGraph
+# Description: Opt-in operation counters and per-method timings for the graph classes
+
+import time
+
+
+class GraphStats:
+    """
+    Counters and timings collected by a graph between enable_stats() and disable_stats().
+    The counters add up the work done by the searches of the graph:
+    - vertices_expanded: vertices whose edges were scanned
+    - edges_relaxed: edges scanned from the expanded vertices
+    - queue_pushes, queue_pops: entries added to and taken from the stack, queue or heap of a search
+    - cache_hits, cache_misses: query cache lookups
+    calls and seconds map every timed method to its number of calls and total wall time, which includes
+    the time spent in other timed methods it calls. If a callback is given it is called as
+    callback(method, seconds, stats) after every timed call, to export the data as it is collected.
+    """
+
+    COUNTERS = ('vertices_expanded', 'edges_relaxed', 'queue_pushes', 'queue_pops', 'cache_hits', 'cache_misses')
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Sets every counter and timing back to zero.
+        """
+
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+
+        self.calls = dict()
+        self.seconds = dict()
+
+    def count(self, expanded=0, relaxed=0, pushes=0, pops=0) -> None:
+        """
+        Adds the work of one search to the counters.
+        """
+
+        self.vertices_expanded += expanded
+        self.edges_relaxed += relaxed
+        self.queue_pushes += pushes
+        self.queue_pops += pops
+
+    def record(self, method: str, seconds: float) -> None:
+        """
+        Adds one call of "method" taking "seconds" to the timings and passes it on to the callback.
+        """
+
+        self.calls[method] = self.calls.get(method, 0) + 1
+        self.seconds[method] = self.seconds.get(method, 0.0) + seconds
+
+        if self.callback is not None:
+            self.callback(method, seconds, self)
+
+    def as_dict(self) -> dict:
+        """
+        Returns the counters and timings as a plain dict, ready to be serialised.
+        """
+
+        result = {name: getattr(self, name) for name in self.COUNTERS}
+        result['calls'] = dict(self.calls)
+        result['seconds'] = dict(self.seconds)
+
+        return result
+
+    def attach(self, graph, methods: []) -> None:
+        """
+        Replaces the given methods on the "graph" instance with timed wrappers. Nothing is wrapped
+        on the class, so graphs without stats enabled run the plain methods at no extra cost.
+        """
+
+        for name in methods:
+            setattr(graph, name, self._timed(name, getattr(graph, name)))
+
+    @staticmethod
+    def detach(graph, methods: []) -> None:
+        """
+        Removes the timed wrappers installed by attach().
+        """
+
+        for name in methods:
+            graph.__dict__.pop(name, None)
+
+    def _timed(self, name: str, method):
+        """
+        Returns a wrapper around the bound "method" that records the wall time of every call.
+        """
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - start)
+
+        timed.__name__ = name
+        timed.__doc__ = method.__doc__
+
+        return timed
@@ -0,0 +1,73 @@
+# Course: CS261 Data Structures
+# Author: Christopher Wilkie
+# Assignment: DirectedGraph / UndirectedGraph
+# Description: A bounded least recently used cache for graph query results
+
+from collections import OrderedDict
+
+# number of query results kept by each graph unless told otherwise
+QUERY_CACHE_SIZE = 128
+
+
+class QueryCache:
+    """
+    Bounded least recently used cache of query results.
+    The graphs key their entries by (method, arguments, version), where the version is bumped by
+    every change to the graph, so an entry can never be returned for a graph it was not computed on.
+    """
+
+    def __init__(self, maxsize=QUERY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, compute):
+        """
+        Returns the value stored for "key". On a miss the value is computed by calling compute(),
+        stored, and the least recently used entry is dropped if the cache is full.
+        Several threads may share the cache of a frozen graph, so every step copes with an entry
+        being dropped by another thread in between.
+        """
+
+        try:
+            value = self._entries[key]
+        except KeyError:
+            pass
+        else:
+            self.hits += 1
+
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                pass
+
+            return value
+
+        self.misses += 1
+        value = compute()
+
+        if self.maxsize > 0:
+            self._entries[key] = value
+
+            while len(self._entries) > self.maxsize:
+                try:
+                    self._entries.popitem(last=False)
+                except KeyError:
+                    break
+
+        return value
+
+    def clear(self) -> None:
+        """
+        Drops every entry, the hit and miss counts are kept.
+        """
+
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns a dict with the number of hits and misses so far and the current and maximum size.
+        """
+
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'maxsize': self.maxsize}
@@ -0,0 +1,48 @@
+# Course: CS261 Data Structures
+# Author: Christopher Wilkie
+# Assignment: DirectedGraph / UndirectedGraph
+# Description: Handing arrays to process pool workers through shared memory instead of pickling them
+
+from array import array
+from multiprocessing.shared_memory import SharedMemory
+
+
+def share_arrays(buffers: []) -> ([], []):
+    """
+    Copies every array into a new shared memory block. Returns the blocks, which the caller must
+    release() once the workers are done, and the (name, typecode, length) layout to pass to attach_arrays().
+    """
+
+    blocks = []
+
+    for buffer in buffers:
+        block = SharedMemory(create=True, size=max(1, len(buffer) * buffer.itemsize))
+        block.buf[:len(buffer) * buffer.itemsize] = buffer.tobytes()
+        blocks.append(block)
+
+    layout = [(block.name, buffer.typecode, len(buffer)) for block, buffer in zip(blocks, buffers)]
+
+    return blocks, layout
+
+
+def attach_arrays(layout: []) -> ([], []):
+    """
+    Maps the shared arrays described by a layout from share_arrays(), returns the blocks and a read-only
+    memoryview of every array. The blocks must be kept alongside the views for as long as they are used.
+    """
+
+    blocks = [SharedMemory(name) for name, _, _ in layout]
+    views = [block.buf[:length * array(typecode).itemsize].cast(typecode)
+             for block, (_, typecode, length) in zip(blocks, layout)]
+
+    return blocks, views
+
+
+def release(blocks: []) -> None:
+    """
+    Closes and frees the shared memory blocks created by share_arrays().
+    """
+
+    for block in blocks:
+        block.close()
+        block.unlink()
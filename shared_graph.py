@@ -0,0 +1,41 @@
+# Course: CS261 Data Structures
+# Author: Christopher Wilkie
+# Assignment: DirectedGraph / UndirectedGraph
+# Description: Sharing one graph between a writer thread and many reader threads through frozen copies
+
+import threading
+from contextlib import contextmanager
+
+
+class SharedGraph:
+    """
+    Shares a DirectedGraph or UndirectedGraph between any number of reader threads and writers.
+    Readers call read() and get the latest published frozen copy of the graph, which never changes
+    and needs no locking however long they use it. Writers change the graph inside a write() block,
+    which holds the writer lock and publishes a new frozen copy when the block ends. Publishing replaces
+    a single reference, so every reader sees either the old or the new version, never a mix.
+    """
+
+    def __init__(self, graph):
+        self._graph = graph
+        self._lock = threading.Lock()
+        self._published = graph.freeze()
+
+    def read(self):
+        """
+        Returns the latest published read-only version of the graph.
+        """
+
+        return self._published
+
+    @contextmanager
+    def write(self):
+        """
+        Context manager giving the graph to change. Writers are serialised, and the changes are published
+        together when the block ends. If the block raises nothing is published, but the changes made
+        so far stay in the graph and are published by the next write().
+        """
+
+        with self._lock:
+            yield self._graph
+            self._published = self._graph.freeze()
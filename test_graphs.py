@@ -0,0 +1,546 @@
+# Course: CS261 Data Structures
+# Author: Christopher Wilkie
+# Assignment: DirectedGraph / UndirectedGraph
+# Description: Regression checks comparing the graph methods with a simpler or from-scratch computation
+
+import os
+import random
+import tempfile
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from directed import DirectedGraph
+from undirected import UndirectedGraph, _InternedGraph, _parallel_component_labels
+
+
+def random_directed(rnd: random.Random, v_count: int, e_count: int) -> DirectedGraph:
+    """
+    Returns a DirectedGraph with "v_count" vertices and up to "e_count" random edges.
+    """
+
+    graph = DirectedGraph()
+    graph.add_vertices(v_count)
+
+    for _ in range(e_count):
+        graph.add_edge(rnd.randrange(v_count), rnd.randrange(v_count), rnd.randint(1, 20))
+
+    return graph
+
+
+def random_undirected(rnd: random.Random, v_count: int, e_count: int) -> UndirectedGraph:
+    """
+    Returns an UndirectedGraph with up to "v_count" vertices named by number and up to "e_count" random edges.
+    """
+
+    graph = UndirectedGraph()
+
+    for _ in range(e_count):
+        graph.add_edge(str(rnd.randrange(v_count)), str(rnd.randrange(v_count)))
+
+    return graph
+
+
+def check_tracked_sources(graph: DirectedGraph, sources: []) -> None:
+    """
+    Checks the repaired tree of every tracked source against a fresh run of _dijkstra().
+    """
+
+    for src in sources:
+        distances = graph._dijkstra(src)[0]
+        assert graph.dijkstra(src) == distances
+
+        for dst in range(graph.v_count):
+            path = graph.tracked_path(src, dst)
+
+            if distances[dst] == float('inf'):
+                assert path == []
+            else:
+                assert path[0] == src and path[-1] == dst
+                assert sum(graph.adj_matrix[a][b] for a, b in zip(path, path[1:])) == distances[dst]
+
+
+def test_add_edge_rejects_non_integer_ids():
+    """
+    add_edge() and remove_edge() ignore vertex ids that are not integers, as they ignore ids out of range.
+    """
+
+    graph = DirectedGraph()
+    graph.add_vertices(3)
+
+    for src, dst in ((0, 1.5), (1.0, 2), ('0', 1), (None, 1)):
+        graph.add_edge(src, dst, 2)
+
+    graph.add_edge(0, 2, 4)
+    graph.remove_edge(0, 2.0)
+
+    assert graph.get_edges() == [(0, 2, 4)]
+    assert graph.dfs(0) == graph.bfs(0) == [0, 2]
+
+
+def test_bulk_edges_report_rejected():
+    """
+    add_edges() and remove_edges() report exactly the edges that add_edge() and remove_edge() would ignore,
+    for lists, generators and NumPy arrays, and leave the graph as the single edge calls would.
+    """
+
+    rnd = random.Random(13)
+    ids = [0, 1, 2, 3, 4, -1, 5, 1.5, 2.0, '1', None]
+
+    for trial in range(60):
+        edges = [(rnd.choice(ids), rnd.choice(ids), rnd.choice([1, 3, 0, -2, 2.5])) for _ in range(rnd.randint(0, 12))]
+        expected = DirectedGraph()
+        expected.add_vertices(5)
+        rejected = []
+
+        for src, dst, weight in edges:
+            expected.add_edge(src, dst, weight)
+
+            if (type(src) is not int or type(dst) is not int or not 0 <= src < 5 or not 0 <= dst < 5
+                    or src == dst or weight <= 0):
+                rejected.append((src, dst, weight))
+
+        graph = DirectedGraph()
+        graph.add_vertices(5)
+        assert graph.add_edges(edge for edge in edges) == rejected
+        assert graph.get_edges() == expected.get_edges()
+
+        removals = [(rnd.choice(ids), rnd.choice(ids)) for _ in range(rnd.randint(0, 12))]
+        present = {(src, dst) for src, dst, _ in graph.get_edges()}
+        missing = []
+
+        for src, dst in removals:
+            if (src, dst) in present and type(src) is int and type(dst) is int:
+                present.discard((src, dst))
+            else:
+                missing.append((src, dst))
+
+        assert graph.remove_edges(removals) == missing
+        assert {(src, dst) for src, dst, _ in graph.get_edges()} == present
+
+    if numpy is not None:
+        graph = DirectedGraph()
+        graph.add_vertices(4)
+        rows = numpy.array([[0, 1.5, 2], [1, 2, 3], [2.0, 3.0, 2.5], [0.5, 3, 1], [numpy.nan, 1, 1], [3, 3, 1]])
+
+        rejected = graph.add_edges(rows)
+
+        assert len(rejected) == 4 and rejected[3] == (3, 3, 1)
+        assert rejected[0] == (0, 1.5, 2) and rejected[1] == (0.5, 3, 1) and rejected[2][0] != rejected[2][0]
+        assert graph.get_edges() == [(1, 2, 3), (2, 3, 2.5)]
+        assert [type(weight) for _, _, weight in graph.get_edges()] == [int, float]
+        assert graph.to_csr()[2].typecode == 'd'
+
+        graph = DirectedGraph()
+        graph.add_vertices(4)
+        rejected = graph.add_edges(numpy.array([[0, 1, 2.0], [1, 2, 3.0], [2, 2, 1.0], [0, 1.5, 1.0]]))
+
+        assert rejected == [(2, 2, 1), (0, 1.5, 1)]
+        assert [type(item) for item in rejected[0]] == [int, int, int]
+        assert graph.get_edges() == [(0, 1, 2), (1, 2, 3)]
+        assert graph.to_csr()[2].typecode == 'q'
+
+
+def test_tracked_trees_match_dijkstra():
+    """
+    Tracked shortest path trees repaired after single edge changes give the same distances as _dijkstra().
+    """
+
+    rnd = random.Random(17)
+
+    for trial in range(60):
+        v_count = rnd.randint(2, 15)
+        graph = random_directed(rnd, v_count, rnd.randint(0, 40))
+
+        if trial % 3 == 0:
+            graph = DirectedGraph.from_csr(*graph.to_csr())
+
+        sources = rnd.sample(range(v_count), min(v_count, 3))
+
+        for src in sources:
+            graph.track_source(src)
+
+        for _ in range(40):
+            src, dst = rnd.randrange(graph.v_count), rnd.randrange(graph.v_count)
+            step = rnd.random()
+
+            if step < 0.45:
+                graph.add_edge(src, dst, rnd.randint(1, 20))
+            elif step < 0.9:
+                edges = graph.get_edges()
+                if edges:
+                    graph.remove_edge(*rnd.choice(edges)[:2])
+            else:
+                graph.add_vertex()
+
+            check_tracked_sources(graph, sources)
+
+
+def test_kernels_match_bfs():
+    """
+    bfs_levels(), reachable() and transitive_closure(), on the sparse rows and on the dense matrix,
+    find the same vertices as bfs(), level by level.
+    """
+
+    rnd = random.Random(11)
+
+    for trial in range(40):
+        v_count = rnd.randint(1, 25)
+        graph = random_directed(rnd, v_count, rnd.randint(0, 3 * v_count))
+
+        for dense in (False, True):
+            closure = graph.transitive_closure(dense=dense)
+
+            for v_start in range(v_count):
+                found = sorted(graph.bfs(v_start))
+                levels = graph.bfs_levels(v_start, dense=dense)
+
+                assert closure[v_start] == found
+                assert graph.reachable([v_start], dense=dense) == found
+                assert sorted(vertex for level in levels for vertex in level) == found
+                assert levels[0] == [v_start]
+
+                seen = {v_start}
+
+                for level, following in zip(levels, levels[1:]):
+                    assert following == sorted({element for vertex in level
+                                                for element in graph._out[vertex]} - seen)
+                    seen.update(following)
+
+            sources = rnd.sample(range(v_count), rnd.randint(0, v_count)) + [-1, v_count]
+            expected = sorted({vertex for src in sources if 0 <= src < v_count for vertex in graph.bfs(src)})
+            assert graph.reachable(sources, dense=dense) == expected
+
+
+def test_add_vertex_connect_is_symmetric():
+    """
+    add_vertex() with a "connect" list adds the edges both ways, so removing a connected vertex leaves no trace.
+    """
+
+    graph = UndirectedGraph()
+    graph.add_vertex('X', ['A', 'B', 'X'])
+    graph.add_vertex('A')
+    assert sorted(map(sorted, graph.get_edges())) == [['A', 'X'], ['B', 'X']]
+
+    graph.remove_vertex('A')
+    assert graph.dfs('X') == ['X', 'B']
+    assert all(vertex in graph.adj_list[element] for vertex in graph.adj_list for element in graph.adj_list[vertex])
+
+
+def test_edge_file_round_trip():
+    """
+    Graphs written with to_edge_file() read back with from_edge_file() as the same graph in every format,
+    and vertex names that would read back differently are refused before anything is written.
+    """
+
+    rnd = random.Random(24)
+    names = ['a', 'b', 'c d', 'e,f', 'g\th', 'i"j', '"k"', 'l#', 'm n o']
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ('edges.txt', 'edges.csv', 'edges.tsv', 'edges.csv.gz', 'edges.txt.gz'):
+            path = os.path.join(directory, name)
+            usable = [vertex for vertex in names if not name.startswith('edges.txt') or len(vertex.split()) == 1]
+
+            for header in (False, True):
+                graph = DirectedGraph()
+                graph.add_vertices(8)
+                graph.add_edges((rnd.randrange(8), rnd.randrange(8), rnd.choice([1, 7, 2.5])) for _ in range(20))
+                graph.to_edge_file(path, header=header)
+                copy = DirectedGraph.from_edge_file(path, header=header)
+                assert copy.get_edges() == graph.get_edges()
+
+                graph = UndirectedGraph((rnd.choice(usable), rnd.choice(usable)) for _ in range(20))
+                graph.to_edge_file(path, header=header)
+                copy = UndirectedGraph.from_edge_file(path, header=header)
+                assert sorted(map(sorted, copy.get_edges())) == sorted(map(sorted, graph.get_edges()))
+
+            for bad in ('#tag', ' p', 'q ', '', 'r\ns') + (('t u',) if name.startswith('edges.txt') else ()):
+                os.remove(path)
+
+                try:
+                    UndirectedGraph([(bad, 'a'), ('b', 'c')]).to_edge_file(path)
+                except ValueError:
+                    assert not os.path.exists(path)
+                else:
+                    raise AssertionError(f'{bad!r} was written to {name}')
+
+                open(path, 'w').close()
+
+
+def test_directed_freeze_keeps_edges():
+    """
+    A frozen DirectedGraph keeps the edges it had when it was taken while the graph goes on changing.
+    """
+
+    rnd = random.Random(22)
+
+    for trial in range(40):
+        graph = random_directed(rnd, rnd.randint(2, 12), rnd.randint(0, 30))
+        snapshots = []
+
+        for _ in range(5):
+            snapshots.append((graph.freeze(), graph.get_edges(), graph.v_count))
+
+            for _ in range(rnd.randint(1, 10)):
+                src, dst = rnd.randrange(graph.v_count), rnd.randrange(graph.v_count)
+                step = rnd.random()
+
+                if step < 0.4:
+                    graph.add_edge(src, dst, rnd.randint(1, 20))
+                elif step < 0.7:
+                    graph.remove_edge(src, dst)
+                elif step < 0.8:
+                    graph.add_edges([(src, dst, rnd.randint(1, 20)), (dst, src, rnd.randint(1, 20))])
+                elif step < 0.9:
+                    graph.remove_edges([(src, dst), (dst, src)])
+                else:
+                    graph.add_vertex()
+
+            for frozen, edges, v_count in snapshots:
+                assert frozen.get_edges() == edges
+                assert frozen.v_count == v_count
+
+        frozen = snapshots[0][0]
+
+        try:
+            frozen.add_edge(0, 1, 1)
+        except TypeError:
+            pass
+        else:
+            raise AssertionError('a frozen DirectedGraph was changed')
+
+
+def test_undirected_freeze_keeps_edges():
+    """
+    A frozen UndirectedGraph keeps the edges and component count it had when it was taken.
+    """
+
+    rnd = random.Random(22)
+
+    for trial in range(40):
+        graph = random_undirected(rnd, 12, rnd.randint(0, 30))
+        snapshots = []
+
+        for _ in range(5):
+            snapshots.append((graph.freeze(), sorted(graph.get_edges()), graph.count_connected_components()))
+
+            for _ in range(rnd.randint(1, 10)):
+                u, v = str(rnd.randrange(12)), str(rnd.randrange(12))
+                step = rnd.random()
+
+                if step < 0.4:
+                    graph.add_edge(u, v)
+                elif step < 0.7:
+                    graph.remove_edge(u, v)
+                elif step < 0.8:
+                    graph.add_edges([(u, v), (v, str(rnd.randrange(12)))])
+                else:
+                    graph.remove_vertex(u)
+
+            for frozen, edges, count in snapshots:
+                assert sorted(frozen.get_edges()) == edges
+                assert frozen.count_connected_components() == count
+
+        try:
+            snapshots[0][0].add_edge('a', 'b')
+        except TypeError:
+            pass
+        else:
+            raise AssertionError('a frozen UndirectedGraph was changed')
+
+
+def test_component_index_after_deletions():
+    """
+    The component index updated in place by removals agrees with one rebuilt from scratch.
+    """
+
+    rnd = random.Random(7)
+
+    for trial in range(60):
+        graph = random_undirected(rnd, 30, rnd.randint(0, 45))
+        graph.count_connected_components()
+
+        for _ in range(30):
+            vertices = list(graph.adj_list)
+            step = rnd.random()
+
+            if step < 0.5 and graph.get_edges():
+                graph.remove_edge(*rnd.choice(graph.get_edges()))
+            elif step < 0.7 and vertices:
+                graph.remove_vertex(rnd.choice(vertices))
+            elif step < 0.8:
+                graph.remove_edges(rnd.sample(graph.get_edges(), min(3, len(graph.get_edges()))))
+            else:
+                graph.add_edge(str(rnd.randrange(30)), str(rnd.randrange(30)))
+
+            rebuilt = UndirectedGraph(graph.get_edges())
+
+            for vertex in graph.adj_list:
+                rebuilt.add_vertex(vertex)
+
+            assert graph.count_connected_components() == rebuilt.count_connected_components()
+
+            for u in graph.adj_list:
+                assert graph.component_of(u) in graph.adj_list
+                for v in graph.adj_list:
+                    assert graph.same_component(u, v) == rebuilt.same_component(u, v)
+
+
+def test_parallel_labels_match_serial():
+    """
+    The process pool component labelling returns the same labels as _InternedGraph.component_labels().
+    """
+
+    rnd = random.Random(25)
+    clustered = UndirectedGraph()
+
+    for cluster in range(20):
+        for _ in range(30):
+            clustered.add_edge(f'{cluster}.{rnd.randrange(15)}', f'{cluster}.{rnd.randrange(15)}')
+
+    for _ in range(10):
+        clustered.add_edge(f'{rnd.randrange(20)}.{rnd.randrange(15)}', f'{rnd.randrange(20)}.{rnd.randrange(15)}')
+
+    for graph in (clustered, random_undirected(rnd, 300, 250), random_undirected(rnd, 300, 600), UndirectedGraph()):
+        core = _InternedGraph(graph.adj_list)
+        labels = core.component_labels()
+
+        for workers in (2, 3, 5):
+            assert _parallel_component_labels(core, workers) == labels
+
+        assert graph.count_connected_components(workers=3) == len(set(labels))
+
+
+def test_snapshot_round_trip():
+    """
+    Graphs loaded from a save() snapshot, memory mapped or read, equal the saved graphs, keep int and float
+    weights apart, and go on changing like them. Truncated snapshots raise ValueError.
+    """
+
+    rnd = random.Random(12)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'graph.snap')
+
+        for trial in range(30):
+            v_count = rnd.randint(0, 12)
+            graph = random_directed(rnd, v_count, rnd.randint(0, 30) if v_count else 0)
+
+            if v_count > 1 and trial % 2:
+                graph.add_edge(0, graph.v_count - 1, 2.5)
+
+            graph.save(path)
+
+            for mmap in (True, False):
+                copy = DirectedGraph.load(path, mmap=mmap)
+
+                assert copy.v_count == graph.v_count
+                assert copy.get_edges() == graph.get_edges()
+                assert [type(weight) for _, _, weight in copy.get_edges()] == \
+                       [type(weight) for _, _, weight in graph.get_edges()]
+
+                expected = DirectedGraph()
+                expected.add_vertices(graph.v_count)
+                expected.add_edges(graph.get_edges())
+
+                for target in (expected, copy):
+                    target.add_edge(1, 0, 4)
+                    target.remove_edge(0, graph.v_count - 1)
+                    target.add_vertex()
+
+                assert copy.get_edges() == expected.get_edges()
+                assert [copy.dfs(vertex) for vertex in range(copy.v_count)] == \
+                       [expected.dfs(vertex) for vertex in range(expected.v_count)]
+
+            graph = random_undirected(rnd, 12, rnd.randint(0, 30))
+            graph.add_vertex('lone vertex')
+            graph.add_edge('ünïcode', 'lone vertex')
+            graph.save(path)
+
+            for mmap in (True, False):
+                copy = UndirectedGraph.load(path, mmap=mmap)
+
+                assert str(copy) == str(graph)
+                assert copy.count_connected_components() == graph.count_connected_components()
+
+                copy.remove_vertex('lone vertex')
+                assert 'lone vertex' not in copy.get_vertices() and 'lone vertex' in graph.get_vertices()
+
+        for cls, graph in ((DirectedGraph, DirectedGraph([(0, 1, 3), (1, 2, 4)])),
+                           (UndirectedGraph, UndirectedGraph([('a', 'b'), ('b', 'c')]))):
+            graph.save(path)
+
+            with open(path, 'rb') as file:
+                data = file.read()
+
+            for cut in (1, 8, len(data) - 1):
+                with open(path, 'wb') as file:
+                    file.write(data[:-cut])
+
+                try:
+                    cls.load(path)
+                except ValueError:
+                    pass
+                else:
+                    raise AssertionError(f'a {cls.__name__} snapshot missing {cut} bytes was loaded')
+
+
+def test_shortest_path_matches_full_search():
+    """
+    shortest_path() returns a valid path whose length is the dijkstra() distance on a DirectedGraph and
+    the BFS distance on an UndirectedGraph, and ([], inf) when there is no path.
+    """
+
+    rnd = random.Random(14)
+
+    for trial in range(40):
+        v_count = rnd.randint(1, 15)
+        graph = random_directed(rnd, v_count, rnd.randint(0, 3 * v_count))
+
+        for src in range(-1, v_count + 1):
+            distances = graph.dijkstra(src) if 0 <= src < v_count else [float('inf')] * v_count
+
+            for dst in range(-1, v_count + 1):
+                path, distance = graph.shortest_path(src, dst)
+
+                if not 0 <= dst < v_count or distances[dst] == float('inf'):
+                    assert (path, distance) == ([], float('inf'))
+                    continue
+
+                assert distance == distances[dst]
+                assert path[0] == src and path[-1] == dst
+                assert sum(graph.adj_matrix[a][b] for a, b in zip(path, path[1:])) == distance
+
+        graph = random_undirected(rnd, v_count + 1, rnd.randint(0, 2 * v_count))
+        graph.add_vertex('lone')
+
+        for u in graph.adj_list:
+            levels = {u: 0}
+            queue = [u]
+
+            for vertex in queue:
+                for element in graph.adj_list[vertex]:
+                    if element not in levels:
+                        levels[element] = levels[vertex] + 1
+                        queue.append(element)
+
+            for v in list(graph.adj_list) + ['missing']:
+                path, distance = graph.shortest_path(u, v)
+
+                if v not in levels:
+                    assert (path, distance) == ([], float('inf'))
+                    continue
+
+                assert distance == levels[v] == len(path) - 1
+                assert path[0] == u and path[-1] == v
+                assert all(b in graph.adj_list[a] for a, b in zip(path, path[1:]))
+
+
+if __name__ == '__main__':
+
+    for name, check in list(globals().items()):
+        if name.startswith('test_'):
+            check()
+            print(name, 'ok')
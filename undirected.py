@@ -3,6 +3,253 @@
 # Assignment: UndirectedGraph
 # Description: A collection of functions used to create and manipulate UndirectedGraphs
 
+import mmap as mmap_module
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from cooperative import ASYNC_YIELD_EVERY, cooperative, deadline, pause
+from edge_files import (EDGE_FILE_CHUNK_SIZE, check_vertex_name, edge_delimiter, parse_undirected_edges,
+                        read_edge_chunks, write_edge_file)
+from graph_stats import GraphStats
+from query_cache import QueryCache
+from shared_arrays import attach_arrays, release, share_arrays
+
+# snapshot file header: magic, format version, byte order, vertex count, adjacency entry count, name bytes
+SNAPSHOT_HEADER = struct.Struct('<4sHc9xQQQ')
+SNAPSHOT_MAGIC = b'UGRF'
+SNAPSHOT_VERSION = 1
+
+
+class _Neighbours(dict):
+    """
+    Insertion-ordered set of the neighbours of a vertex, used as the values of adj_list.
+    Membership, insertion and deletion are O(1), and it prints like a list so the
+    adjacency list output is unchanged.
+    """
+
+    __slots__ = ('_sorted',)
+
+    def __init__(self, vertices=()):
+        super().__init__((vertex, None) for vertex in vertices)
+        self._sorted = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def append(self, vertex: str) -> None:
+        """
+        Adds a neighbour, it is kept after the existing ones.
+        """
+
+        self[vertex] = None
+        self._sorted = None
+
+    def remove(self, vertex: str) -> None:
+        """
+        Removes a neighbour, raises KeyError if it is not present.
+        """
+
+        del self[vertex]
+        self._sorted = None
+
+    def sorted(self) -> []:
+        """
+        Returns the neighbours in alphabetical order. The sorted list is cached until the next change.
+        """
+
+        if self._sorted is None:
+            self._sorted = sorted(self)
+
+        return self._sorted
+
+
+class _DisjointSet:
+    """
+    Disjoint sets of vertex names, used to keep track of the connected components of an UndirectedGraph.
+    Every vertex points straight at the number of its set and every set holds its members, so find() is a
+    single lookup, union() relabels the smaller set and split() relabels only the vertices that leave a set.
+    """
+
+    def __init__(self):
+        self.label = dict()
+        self.members = dict()
+        self.representative = dict()
+        self.count = 0
+        self.next_label = 0
+
+    @classmethod
+    def from_labels(cls, names: [], labels: []) -> '_DisjointSet':
+        """
+        Builds the sets from component labels, where labels[i] is the number of the vertex that
+        represents names[i].
+        """
+
+        components = cls()
+        label_of = components.label
+        members_of = components.members
+
+        for number, name in enumerate(names):
+            label = labels[number]
+            label_of[name] = label
+            members = members_of.get(label)
+
+            if members is None:
+                members = members_of[label] = set()
+                components.representative[label] = names[label]
+
+            members.add(name)
+
+        components.count = len(members_of)
+        components.next_label = len(names)
+
+        return components
+
+    def add(self, vertex: str) -> None:
+        """
+        Adds a vertex as a component of its own, does nothing if it is already present.
+        """
+
+        if vertex not in self.label:
+            self.label[vertex] = self.next_label
+            self.members[self.next_label] = {vertex}
+            self.representative[self.next_label] = vertex
+            self.next_label += 1
+            self.count += 1
+
+    def remove(self, vertex: str) -> None:
+        """
+        Takes a vertex out of its set, the set is dropped once it is empty.
+        """
+
+        label = self.label.pop(vertex)
+        members = self.members[label]
+        members.discard(vertex)
+
+        if not members:
+            del self.members[label]
+            del self.representative[label]
+            self.count -= 1
+        elif self.representative[label] == vertex:
+            self.representative[label] = next(iter(members))
+
+    def find(self, vertex: str) -> str:
+        """
+        Returns the representative of the set containing the vertex.
+        """
+
+        return self.representative[self.label[vertex]]
+
+    def union(self, u: str, v: str) -> None:
+        """
+        Merges the sets containing "u" and "v".
+        """
+
+        u_label = self.label[u]
+        v_label = self.label[v]
+
+        if u_label == v_label:
+            return None
+
+        if len(self.members[u_label]) < len(self.members[v_label]):
+            u_label, v_label = v_label, u_label
+
+        moved = self.members.pop(v_label)
+        del self.representative[v_label]
+
+        for vertex in moved:
+            self.label[vertex] = u_label
+
+        self.members[u_label] |= moved
+        self.count -= 1
+
+        return None
+
+    def split(self, vertices: set, keep: str) -> None:
+        """
+        Moves the "vertices" out of their set into a new one. "keep" is a vertex of the old set
+        that stays behind and becomes its representative if the old one left.
+        """
+
+        label = self.label[keep]
+        self.members[label] -= vertices
+
+        if self.representative[label] in vertices:
+            self.representative[label] = keep
+
+        for vertex in vertices:
+            self.label[vertex] = self.next_label
+
+        self.members[self.next_label] = vertices
+        self.representative[self.next_label] = next(iter(vertices))
+        self.next_label += 1
+        self.count += 1
+
+    def copy(self) -> '_DisjointSet':
+        """
+        Returns an independent copy of the sets.
+        """
+
+        components = _DisjointSet()
+        components.label = dict(self.label)
+        components.members = {label: set(members) for label, members in self.members.items()}
+        components.representative = dict(self.representative)
+        components.count = self.count
+        components.next_label = self.next_label
+
+        return components
+
+
+class _InternedGraph:
+    """
+    Read-only integer view of an UndirectedGraph. Vertex names are interned to dense numbers 0 .. V - 1
+    in adj_list order and the adjacency lists are held as CSR arrays of those numbers, so whole-graph
+    algorithms can run on compact arrays and bytearrays instead of hashing strings. It is built for one
+    such pass and dropped after it, the graph never keeps it.
+    """
+
+    def __init__(self, adj_list: dict):
+        self.names = list(adj_list)
+        self.ids = {name: number for number, name in enumerate(self.names)}
+        self.offsets = array('q', [0])
+        self.neighbours = array('i')
+
+        number_of = self.ids.__getitem__
+
+        for name in self.names:
+            self.neighbours.extend(map(number_of, adj_list[name]))
+            self.offsets.append(len(self.neighbours))
+
+    def component_labels(self) -> array:
+        """
+        Returns an array giving, for every vertex number, the number of the first vertex of its connected component.
+        """
+
+        offsets = self.offsets
+        neighbours = self.neighbours
+        labels = array('i', [-1]) * len(self.names)
+
+        for root in range(len(self.names)):
+
+            if labels[root] >= 0:
+                continue
+
+            labels[root] = root
+            stack = [root]
+
+            while stack:
+                vertex = stack.pop()
+
+                for element in neighbours[offsets[vertex]:offsets[vertex + 1]]:
+                    if labels[element] < 0:
+                        labels[element] = root
+                        stack.append(element)
+
+        return labels
+
 
 class UndirectedGraph:
     """
@@ -13,6 +260,24 @@ class UndirectedGraph:
     - vertex names are strings
     """
 
+    # _DisjointSet index of the connected components, None until it is first needed
+    _components = None
+
+    # mutation counter, part of every query cache key so cached results never outlive a change
+    _version = 0
+    _cache = None
+
+    # GraphStats collecting counters and timings while enable_stats() is on, None otherwise
+    _stats = None
+
+    # vertices whose neighbours the graph copied for itself since the last freeze(), None if no frozen copy shares them
+    _owned = None
+
+    # public methods timed while stats are enabled
+    _TIMED_METHODS = ('add_vertex', 'add_edge', 'remove_edge', 'remove_vertex', 'add_edges', 'remove_edges',
+                      'get_edges', 'is_valid_path', 'dfs', 'bfs', 'shortest_path', 'count_connected_components',
+                      'component_of', 'same_component', 'has_cycle', 'find_cycle', 'save', 'to_edge_file')
+
     def __init__(self, start_edges=None):
         """
         Store graph info as adjacency list
@@ -43,19 +308,24 @@ class UndirectedGraph:
     def add_vertex(self, v: str, connect=None) -> None:
         """
         Adds a vertex to an UndirectedGraph.
+        The vertex is joined by an edge to every vertex in "connect", which are added as needed.
         """
 
-        for vertex in self.adj_list:
-            if vertex == v:
-                return None
+        if v in self.adj_list:
+            return None
+
+        self.adj_list[v] = _Neighbours()
+        self._version += 1
 
-        if connect is None:
-            self.adj_list[v] = []
-        else:
-            self.adj_list[v] = connect
+        if self._components is not None:
+            self._components.add(v)
+
+        if connect is not None:
+            for vertex in connect:
+                self.add_edge(v, vertex)
 
         return None
-        
+
     def add_edge(self, u: str, v: str) -> None:
         """
         Adds an edge to an UndirectedGraph.
@@ -64,22 +334,17 @@ class UndirectedGraph:
         if u == v:
             return None
 
-        v_in = False
-        u_in = False
+        self.add_vertex(u)
+        self.add_vertex(v)
 
-        for vertex in self.adj_list:
-            if vertex == v:
-                if u not in self.adj_list[v]:
-                    self.adj_list[vertex].append(u)
-            if vertex == u:
-                if v not in self.adj_list[u]:
-                    self.adj_list[vertex].append(v)
-
-        if not u_in:
-            self.add_vertex(u, [v])
-
-        if not v_in:
-            self.add_vertex(v, [u])
+        if v not in self.adj_list[u]:
+            if self._owned is not None:
+                self._unshare(u, v)
+            self.adj_list[u].append(v)
+            self.adj_list[v].append(u)
+            self._version += 1
+            if self._components is not None:
+                self._components.union(u, v)
 
         return None
 
@@ -88,19 +353,15 @@ class UndirectedGraph:
         Removes an edge from an UndirectedGraph.
         """
 
-        v_in = False
-        u_in = False
-
-        for vertex in self.adj_list:
-            if vertex == v:
-                v_in = True
-            if vertex == u:
-                u_in = True
-
-        if v_in and u_in:
+        if v in self.adj_list and u in self.adj_list:
             if u in self.adj_list[v]:
+                if self._owned is not None:
+                    self._unshare(u, v)
                 self.adj_list[v].remove(u)
                 self.adj_list[u].remove(v)
+                self._version += 1
+                if self._components is not None:
+                    self._disconnect(v, u)
 
         return None
 
@@ -112,14 +373,94 @@ class UndirectedGraph:
         if v not in self.adj_list:
             return None
 
-        del self.adj_list[v]
+        neighbours = self.adj_list.pop(v)
 
-        for vertex in self.adj_list:
-            if v in self.adj_list[vertex]:
+        for vertex in neighbours:
+            if vertex in self.adj_list and v in self.adj_list[vertex]:
+                if self._owned is not None:
+                    self._unshare(vertex)
                 self.adj_list[vertex].remove(v)
 
+        self._version += 1
+        components = self._components
+
+        if components is not None:
+            components.remove(v)
+            pivot = None
+
+            # the neighbours were all in one component, every one of them still in the pivot's set is checked
+            # against the pivot, and whichever of the two stays in that set after a split becomes the pivot
+            for vertex in neighbours:
+                if pivot is None:
+                    pivot = vertex
+                elif components.find(vertex) == components.find(pivot):
+                    pivot = self._disconnect(pivot, vertex)
+
         return None
 
+    def add_edges(self, edges) -> []:
+        """
+        Adds every (u, v) edge of an iterable, creating the vertices as needed. Any iterable can be used,
+        including generators, and edges already in the graph or given twice are only added once.
+        Returns a list of the edges that were rejected because they are loops.
+        """
+
+        adj_list = self.adj_list
+        components = self._components
+        owned = self._owned
+        rejected = []
+
+        for u, v in edges:
+
+            if u == v:
+                rejected.append((u, v))
+                continue
+
+            if u not in adj_list:
+                self.add_vertex(u)
+
+            if v not in adj_list:
+                self.add_vertex(v)
+
+            if v not in adj_list[u]:
+                if owned is not None:
+                    self._unshare(u, v)
+                adj_list[u].append(v)
+                adj_list[v].append(u)
+                self._version += 1
+
+                if components is not None:
+                    components.union(u, v)
+
+        return rejected
+
+    def remove_edges(self, edges) -> []:
+        """
+        Removes every (u, v) edge of an iterable.
+        Returns a list of the edges that were rejected because they are not in the graph.
+        """
+
+        adj_list = self.adj_list
+        components = self._components
+        owned = self._owned
+        rejected = []
+
+        for u, v in edges:
+
+            if u in adj_list and v in adj_list[u]:
+                if owned is not None:
+                    self._unshare(u, v)
+                adj_list[u].remove(v)
+                adj_list[v].remove(u)
+                self._version += 1
+
+                if components is not None:
+                    self._disconnect(u, v)
+            else:
+                rejected.append((u, v))
+
+        return rejected
+
     def get_vertices(self) -> []:
         """
         Returns a list of vertices.
@@ -137,14 +478,23 @@ class UndirectedGraph:
         Returns a list of edges in a graph represented by tuples containing the two connected vertices.
         """
 
-        edge_tuples = []
+        return list(self.iter_edges())
+
+    def iter_edges(self):
+        """
+        Generator version of get_edges(), yields each edge once in the same order, O(V + E) overall.
+        An edge is reported from whichever of its two vertices was added to the graph first.
+        """
+
+        done = set()
 
         for vertex in self.adj_list:
+
             for connect in self.adj_list[vertex]:
-                if (connect, vertex) not in edge_tuples:
-                    edge_tuples.append((vertex, connect))
+                if connect not in done:
+                    yield vertex, connect
 
-        return edge_tuples
+            done.add(vertex)
 
     def is_valid_path(self, path: []) -> bool:
         """
@@ -178,114 +528,766 @@ class UndirectedGraph:
         Vertices are picked in alphabetical order.
         """
 
+        return list(self._cached('dfs', (v_start, v_end), lambda: list(self.iter_dfs(v_start, v_end))))
+
+    def bfs(self, v_start, v_end=None) -> []:
+        """
+        Returns a list of vertices visited during BFS search.
+        Vertices are picked in alphabetical order.
+        """
+
+        return list(self._cached('bfs', (v_start, v_end), lambda: list(self.iter_bfs(v_start, v_end))))
+
+    def iter_dfs(self, v_start, v_end=None):
+        """
+        Generator version of dfs(), yields the vertices one at a time in the same order.
+        """
+
         if v_start not in self.adj_list:
-            return []
+            return
 
-        visited = []
+        visited = set()
         stack = [v_start]
+        skipped = 0
 
-        while stack:
-
-            vertex = stack.pop()
+        try:
+            while stack:
 
-            if vertex in visited:
-                continue
+                vertex = stack.pop()
 
-            visited.append(vertex)
+                if vertex in visited:
+                    skipped += 1
+                    continue
 
-            if vertex == v_end:
-                return visited
+                visited.add(vertex)
+                yield vertex
 
-            to_stack = self.adj_list[vertex].copy()
-            to_stack.sort(reverse=True)
+                if vertex == v_end:
+                    return
 
-            for element in to_stack:
-                if element != vertex and element not in visited:
-                    stack.append(element)
+                for element in reversed(self.adj_list[vertex].sorted()):
+                    if element not in visited:
+                        stack.append(element)
 
-        return visited
+        finally:
+            if self._stats is not None:
+                pops = len(visited) + skipped
+                self._count_search(visited, pops + len(stack), pops)
 
-    def bfs(self, v_start, v_end=None) -> []:
+    def iter_bfs(self, v_start, v_end=None):
         """
-        Returns a list of vertices visited during BFS search.
-        Vertices are picked in alphabetical order.
+        Generator version of bfs(), yields the vertices one at a time in the same order.
         """
-        
+
         if v_start not in self.adj_list:
-            return []
+            return
 
-        visited = []
-        queue = [v_start]
+        # vertices are marked when queued, which visits them in the same order as marking them when dequeued
+        visited = {v_start}
+        queue = deque([v_start])
 
-        while queue:
+        try:
+            while queue:
 
-            vertex = queue.pop(0)
+                vertex = queue.popleft()
+                yield vertex
 
-            if vertex in visited:
-                continue
+                if vertex == v_end:
+                    return
 
-            visited.append(vertex)
+                for element in self.adj_list[vertex].sorted():
+                    if element not in visited:
+                        visited.add(element)
+                        queue.append(element)
 
-            if vertex == v_end:
-                return visited
+        finally:
+            if self._stats is not None:
+                # every marked vertex was queued once, the ones still queued were never expanded
+                self._count_search(visited, len(visited), len(visited) - len(queue), queue)
 
-            to_queue = self.adj_list[vertex].copy()
-            to_queue.sort()
+    def adfs(self, v_start, v_end=None, every=ASYNC_YIELD_EVERY, timeout=None):
+        """
+        Async iterator version of dfs() for use inside asyncio code. It yields the vertices in the same order
+        and returns to the event loop after every "every" vertices, so other tasks keep running and the search
+        can be cancelled there. Raises asyncio.TimeoutError if it runs for more than "timeout" seconds.
+        The search runs on a frozen copy of the graph, so changes made while it is paused do not affect it.
+        """
+
+        return cooperative(self.freeze().iter_dfs(v_start, v_end), every, timeout)
 
-            for element in to_queue:
-                if element != vertex and element not in visited:
-                    queue.append(element)
+    def abfs(self, v_start, v_end=None, every=ASYNC_YIELD_EVERY, timeout=None):
+        """
+        Async iterator version of bfs(), behaving like adfs().
+        """
 
-        return visited
+        return cooperative(self.freeze().iter_bfs(v_start, v_end), every, timeout)
 
-    def count_connected_components(self):
+    def shortest_path(self, u: str, v: str) -> ([], float):
+        """
+        Returns a tuple (path, distance) for a shortest path between "u" and "v", where path is the list of
+        vertices from "u" to "v" and distance its number of edges. Returns ([], inf) if there is no path.
+        Runs a bidirectional BFS that always grows the smaller of the two frontiers by one level,
+        so far fewer vertices are explored than with bfs().
+        """
+
+        path, distance = self._cached('shortest_path', (u, v), lambda: self._bidirectional_bfs(u, v))
+
+        return list(path), distance
+
+    def _bidirectional_bfs(self, u: str, v: str) -> ([], float):
+        """
+        Bidirectional BFS behind shortest_path(), returns the same (path, distance) tuple.
+        """
+
+        if u not in self.adj_list or v not in self.adj_list:
+            return [], float('inf')
+
+        if u == v:
+            return [u], 0
+
+        # index 0 holds the search from u, index 1 the search from v
+        distances = ({u: 0}, {v: 0})
+        parents = ({u: None}, {v: None})
+        frontiers = [[u], [v]]
+
+        if self._stats is not None:
+            self._stats.count(pushes=2)
+
+        while frontiers[0] and frontiers[1]:
+
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            other = 1 - side
+            level = []
+            best = None
+
+            for vertex in frontiers[side]:
+                for element in self.adj_list[vertex]:
+
+                    # the searches meet, keep the shortest meeting edge of the whole level
+                    if element in distances[other]:
+                        length = distances[side][vertex] + 1 + distances[other][element]
+
+                        if best is None or length < best[0]:
+                            best = (length, vertex, element)
+
+                    if element not in distances[side]:
+                        distances[side][element] = distances[side][vertex] + 1
+                        parents[side][element] = vertex
+                        level.append(element)
+
+            if self._stats is not None:
+                self._count_search(frontiers[side], len(level), len(frontiers[side]))
+
+            if best is not None:
+                length, vertex, element = best
+
+                # orient the meeting edge from the u side to the v side
+                if side == 1:
+                    vertex, element = element, vertex
+
+                path = []
+
+                while vertex is not None:
+                    path.append(vertex)
+                    vertex = parents[0][vertex]
+
+                path.reverse()
+
+                while element is not None:
+                    path.append(element)
+                    element = parents[1][element]
+
+                return path, length
+
+            frontiers[side] = level
+
+        return [], float('inf')
+
+    def count_connected_components(self, workers=1):
         """
         Returns a number representing the amount of connected components of a graph
         EX: The count would be > 1 if any "islands" of vertices exist.
+        With more than one worker, rebuilding the component index labels the vertices in a process pool.
+        That only helps when the vertices were added cluster by cluster, so that few edges cross between
+        ranges of vertices, and the serial interning of the vertex names that comes first often costs more.
         """
 
-        vertices = []
-        connections = 0
+        return self._component_index(workers).count
+
+    async def aconnected_components(self, every=ASYNC_YIELD_EVERY, timeout=None):
+        """
+        Async iterator over the connected components of the graph, yielding each one as a list of its vertices
+        in the order they were found. Returns to the event loop after every "every" vertices and raises
+        asyncio.TimeoutError if it runs for more than "timeout" seconds, like adfs().
+        The search runs on a frozen copy of the graph.
+        """
+
+        adj_list = self.freeze().adj_list
+        end = deadline(timeout)
+        seen = set()
+        steps = 0
+
+        for root in adj_list:
+
+            if root in seen:
+                continue
 
-        for element in self.adj_list:
-            vertices.append(element)
+            seen.add(root)
+            component = [root]
+            stack = [root]
 
-        while vertices:
+            while stack:
 
-            connections += 1
+                for element in adj_list[stack.pop()]:
+                    if element not in seen:
+                        seen.add(element)
+                        component.append(element)
+                        stack.append(element)
 
-            connected = self.dfs(vertices[0])
+                steps += 1
 
-            for element in connected:
-                if element in vertices:
-                    vertices.remove(element)
+                if steps == every:
+                    steps = 0
+                    await pause(end)
 
-        return connections
+            yield component
 
-    def has_cycle(self):
+    def component_of(self, v: str):
+        """
+        Returns the representative vertex of the connected component containing "v".
+        Two vertices are in the same component if and only if they have the same representative.
+        Returns None if the vertex is not in the graph.
+        """
+
+        if v not in self.adj_list:
+            return None
+
+        return self._component_index().find(v)
+
+    def same_component(self, u: str, v: str) -> bool:
+        """
+        Returns True if there is a path between "u" and "v", False if not.
+        """
+
+        if u not in self.adj_list or v not in self.adj_list:
+            return False
+
+        components = self._component_index()
+
+        return components.find(u) == components.find(v)
+
+    def has_cycle(self, workers=1):
         """
         Returns True if the graph is cyclic, False if it is acyclic.
+        The components are counted with "workers" processes, as in count_connected_components().
         """
 
-        vertices = []
+        # a forest with V vertices and C components has exactly V - C edges, any extra edge closes a cycle
+        edges = sum(len(self.adj_list[vertex]) for vertex in self.adj_list) // 2
+
+        return edges > len(self.adj_list) - self.count_connected_components(workers)
+
+    def find_cycle(self) -> []:
+        """
+        Returns a list of vertices forming a cycle, starting and ending with the same vertex.
+        Returns an empty list if the graph is acyclic. The graph is not modified.
+        """
+
+        parent = dict()
+
+        for root in self.adj_list:
+
+            if root in parent:
+                continue
+
+            parent[root] = None
+            stack = [(root, iter(self.adj_list[root]))]
+
+            while stack:
+
+                vertex, neighbours = stack[-1]
+
+                for element in neighbours:
+
+                    if element not in parent:
+                        parent[element] = vertex
+                        stack.append((element, iter(self.adj_list[element])))
+                        break
+
+                    # in an undirected DFS any visited neighbour other than the parent is an ancestor
+                    if element != parent[vertex]:
+                        path = [entry[0] for entry in stack]
+                        cycle = path[path.index(element):]
+                        cycle.append(element)
+
+                        if self._stats is not None:
+                            self._count_search(parent, len(parent), len(parent) - len(stack))
+
+                        return cycle
+
+                else:
+                    stack.pop()
+
+        if self._stats is not None:
+            self._count_search(parent, len(parent), len(parent))
+
+        return []
+
+    def save(self, path: str) -> None:
+        """
+        Writes the graph to "path" in the binary snapshot format read by load(): a fixed header, the vertex
+        name table (offsets into one UTF-8 blob, each name stored once) and the adjacency lists in CSR form
+        as vertex numbers, all arrays in native byte order. Vertex and neighbour order are preserved.
+        """
+
+        core = _InternedGraph(self.adj_list)
+        names = [vertex.encode() for vertex in core.names]
+        name_offsets = array('q', [0])
+        offsets = core.offsets
+        indices = array('q', core.neighbours)
+
+        for name in names:
+            name_offsets.append(name_offsets[-1] + len(name))
+
+        header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, sys.byteorder[0].encode(),
+                                      len(names), len(indices), name_offsets[-1])
+
+        with open(path, 'wb') as file:
+            file.write(header)
+            name_offsets.tofile(file)
+            offsets.tofile(file)
+            indices.tofile(file)
+            file.write(b''.join(names))
+
+    @classmethod
+    def load(cls, path: str, mmap=True) -> 'UndirectedGraph':
+        """
+        Returns the UndirectedGraph stored in a snapshot file written by save().
+        With "mmap" the file is memory mapped read-only instead of being read, so the adjacency lists are
+        built straight from the mapped arrays and processes loading the same file share its pages.
+        Raises ValueError if the file is not a snapshot this version can read or is truncated.
+        """
+
+        with open(path, 'rb') as file:
+            if mmap:
+                data = memoryview(mmap_module.mmap(file.fileno(), 0, access=mmap_module.ACCESS_READ))
+            else:
+                data = memoryview(file.read())
+
+        if len(data) < SNAPSHOT_HEADER.size:
+            raise ValueError(f'{path} is not an UndirectedGraph snapshot')
+
+        magic, version, byteorder, v_count, e_count, name_bytes = SNAPSHOT_HEADER.unpack_from(data)
+
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f'{path} is not a version {SNAPSHOT_VERSION} UndirectedGraph snapshot')
+
+        if byteorder != sys.byteorder[0].encode():
+            raise ValueError(f'{path} was written on a machine with a different byte order')
+
+        if len(data) != SNAPSHOT_HEADER.size + (2 * (v_count + 1) + e_count) * 8 + name_bytes:
+            raise ValueError(f'{path} does not match the sizes in its header, it may be truncated')
+
+        start = SNAPSHOT_HEADER.size
+        arrays = []
+
+        for length in (v_count + 1, v_count + 1, e_count):
+            end = start + length * 8
+            arrays.append(data[start:end].cast('q'))
+            start = end
+
+        name_offsets, offsets, indices = arrays
+        blob = data[start:start + name_bytes]
+        names = [str(blob[name_offsets[number]:name_offsets[number + 1]], 'utf-8') for number in range(v_count)]
+
+        graph = cls()
+
+        for number in range(v_count):
+            graph.adj_list[names[number]] = _Neighbours(names[connect] for connect in
+                                                        indices[offsets[number]:offsets[number + 1]])
+
+        return graph
+
+    @classmethod
+    def from_edge_file(cls, path: str, chunk_size=EDGE_FILE_CHUNK_SIZE, delimiter=None, header=False,
+                       workers=None) -> 'UndirectedGraph':
+        """
+        Builds an UndirectedGraph from a text file with one "u v" edge per line, as written by to_edge_file().
+        Columns are split on "delimiter", by default ',' for .csv files, a tab for .tsv files and any whitespace
+        otherwise, and gzip compressed files are read as they are. With "header" the first line is skipped,
+        blank lines and lines starting with '#' always are. Further columns, such as weights, are ignored.
+        The file is parsed and added through add_edges() "chunk_size" lines at a time, so apart from the graph
+        itself memory use is bounded by the chunk size. With more than one worker the chunks are parsed in a
+        process pool. Loops are left out. Raises ValueError for a malformed line.
+        """
+
+        graph = cls()
+
+        for edges in read_edge_chunks(path, parse_undirected_edges, chunk_size, delimiter, header, workers):
+            graph.add_edges(edges)
+
+        return graph
+
+    def to_edge_file(self, path: str, delimiter=None, header=False) -> None:
+        """
+        Writes every edge once to "path", one "u v" line at a time in the format read by from_edge_file(),
+        gzip compressed if the name ends in .gz. With "header" the first line holds the column names.
+        Vertices without edges are not recorded. Raises ValueError, before the file is opened, if a vertex
+        name would read back as a different name or edge, see check_vertex_name().
+        """
+
+        delimiter = edge_delimiter(path, delimiter)
+
+        for name, neighbours in self.adj_list.items():
+            if neighbours:
+                check_vertex_name(name, delimiter)
+
+        write_edge_file(path, self.iter_edges(), ('u', 'v'), delimiter, header)
+
+    def freeze(self) -> 'UndirectedGraph':
+        """
+        Returns a read-only copy of the graph as it is now, whose methods that change the graph raise TypeError.
+        The copy shares the neighbour sets of the graph and costs O(V). After it is taken the graph copies
+        the neighbours of a vertex the first time they change, so later changes never show in the copy.
+        A frozen copy can be read from many threads at once without locking while one thread keeps
+        changing the graph.
+        """
+
+        frozen = _FrozenUndirectedGraph.__new__(_FrozenUndirectedGraph)
+        frozen.adj_list = dict(self.adj_list)
+        frozen._version = self._version
+
+        if self._components is not None:
+            frozen._components = self._components.copy()
+
+        self._owned = set()
+
+        return frozen
+
+    def cache_stats(self) -> dict:
+        """
+        Returns the hit and miss counts and the size of the query cache that memoises dfs(), bfs()
+        and shortest_path() results between changes to the graph.
+        """
+
+        return self._query_cache().stats()
+
+    def enable_stats(self, callback=None) -> GraphStats:
+        """
+        Starts counting the vertices expanded, edges relaxed, queue pushes and pops and query cache
+        lookups of the searches, and timing the public methods. Returns the GraphStats that collects them.
+        If a callback is given it is called as callback(method, seconds, stats) after every timed call.
+        Graphs without stats enabled pay nothing for the instrumentation.
+        """
+
+        self.disable_stats()
+        self._stats = GraphStats(callback)
+        self._stats.attach(self, self._TIMED_METHODS)
+
+        return self._stats
+
+    def disable_stats(self) -> GraphStats:
+        """
+        Stops collecting stats and returns what was collected, or None if stats were not enabled.
+        """
+
+        stats = self._stats
+
+        if stats is not None:
+            stats.detach(self, self._TIMED_METHODS)
+            self._stats = None
+
+        return stats
+
+    def get_stats(self) -> GraphStats:
+        """
+        Returns the GraphStats collected since enable_stats(), or None if stats are not enabled.
+        """
+
+        return self._stats
+
+    def _cached(self, method: str, args: tuple, compute):
+        """
+        Returns the result of compute() for a query, memoised under the current graph version.
+        """
 
-        for element in self.adj_list:
-            vertices.append(element)
+        cache = self._query_cache()
 
-        while vertices:
+        if self._stats is None:
+            return cache.get((method, args, self._version), compute)
 
-            vertex = vertices.pop()
-            connects = self.adj_list[vertex].copy()
+        hits, misses = cache.hits, cache.misses
+        value = cache.get((method, args, self._version), compute)
+        self._stats.cache_hits += cache.hits - hits
+        self._stats.cache_misses += cache.misses - misses
 
-            for element in connects:
-                self.remove_edge(vertex, element)
-                route = self.dfs(element)
-                self.add_edge(vertex, element)
+        return value
+
+    def _query_cache(self) -> QueryCache:
+        """
+        Returns the query cache of the graph, creating it on first use.
+        """
+
+        if self._cache is None:
+            self._cache = QueryCache()
+
+        return self._cache
+
+    def _component_index(self, workers=1):
+        """
+        Returns the _DisjointSet index of the connected components.
+        Vertex and edge changes update the index in place. It is built here in O(V + E) the first time it is
+        needed, by "workers" processes if more than one.
+        """
+
+        if self._components is None:
+            core = _InternedGraph(self.adj_list)
+            labels = core.component_labels() if workers <= 1 else _parallel_component_labels(core, workers)
+            self._components = _DisjointSet.from_labels(core.names, labels)
+
+            if self._stats is not None:
+                self._stats.count(len(core.names), len(core.neighbours), len(core.names), len(core.names))
+
+        return self._components
+
+    def _disconnect(self, u: str, v: str) -> str:
+        """
+        Updates the component index after the last path between "u" and "v" may have been cut, when they
+        are still in the same set. Searches from both at once, one vertex from each side in turn, so the work
+        is bounded by the smaller side: if the searches meet the index is kept, otherwise the side whose
+        search ran out is a whole component and is split off. Returns whichever of "u" and "v" stayed in the set.
+        """
+
+        adj_list = self.adj_list
+        seen = ({u}, {v})
+        stacks = ([u], [v])
+
+        while True:
+            for side in (0, 1):
+                stack = stacks[side]
+
+                if not stack:
+                    keep = v if side == 0 else u
+                    self._components.split(seen[side], keep)
+                    return keep
+
+                mine = seen[side]
+                other = seen[1 - side]
+
+                for element in adj_list[stack.pop()]:
+                    if element in other:
+                        return u
+                    if element not in mine:
+                        mine.add(element)
+                        stack.append(element)
+
+    def _count_search(self, visited, pushes: int, pops: int, pending=()) -> None:
+        """
+        Adds a search that marked the "visited" vertices to the stats. The "pending" vertices
+        were marked but never expanded, so their edges are not counted.
+        """
+
+        pending = set(pending)
+        expanded = [vertex for vertex in visited if vertex not in pending]
+        self._stats.count(len(expanded), sum(len(self.adj_list[vertex]) for vertex in expanded), pushes, pops)
+
+    def _unshare(self, *vertices) -> None:
+        """
+        Replaces the neighbours of the given vertices by copies of their own the first time they are
+        changed after freeze(), so the frozen copy that shares them keeps the old neighbours.
+        """
+
+        for vertex in vertices:
+            if vertex not in self._owned:
+                self.adj_list[vertex] = _Neighbours(self.adj_list[vertex])
+                self._owned.add(vertex)
+
+
+class _FrozenUndirectedGraph(UndirectedGraph):
+    """
+    Read-only UndirectedGraph returned by UndirectedGraph.freeze(). The queries work as usual and cache
+    their results in the copy, every method that would change the graph raises TypeError.
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('a frozen UndirectedGraph cannot be changed')
+
+    def freeze(self) -> 'UndirectedGraph':
+        return self
+
+    add_vertex = add_edge = remove_edge = remove_vertex = add_edges = remove_edges = _read_only
+
+
+# ---------------------------------------------------------------------- #
+# process pool helpers for UndirectedGraph.count_connected_components()
+
+# offsets, neighbours and labels arrays of the graph whose components are being found, attached once per worker
+_shared_adjacency = None
+
+
+def _parallel_component_labels(core: _InternedGraph, workers: int) -> array:
+    """
+    Process pool version of _InternedGraph.component_labels(), returns the same labels.
+    The vertices are split into ranges holding about the same number of edges. Every worker labels the
+    components of its range, counting only the edges inside it, straight into a shared labels array,
+    and returns the edges leaving the range as (outside vertex, local root) pairs. The workers then turn
+    those into the distinct pairs of local roots they join, which are merged here with a union-find,
+    so this process only does work in proportion to the number of local components that touch a boundary.
+    Last the workers relabel their ranges with the merged roots.
+    The pool only pays off when the ranges are mostly self-contained, such as graphs whose vertices
+    were added cluster by cluster; on graphs with random edges nearly every edge crosses a range.
+    """
+
+    v_count = len(core.names)
+    total = len(core.neighbours)
+    bounds = [0]
+
+    for part in range(1, workers):
+        bounds.append(max(bounds[-1], min(v_count, bisect_left(core.offsets, total * part // workers))))
+
+    bounds.append(v_count)
+    ranges = [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+    blocks, layout = share_arrays((core.offsets, core.neighbours, array('i', [-1]) * v_count))
+    labels = blocks[2].buf[:v_count * 4].cast('i')
+
+    try:
+        with ProcessPoolExecutor(workers, initializer=_attach_adjacency, initargs=(layout,)) as executor:
+            boundaries = list(executor.map(_label_range, *zip(*ranges)))
+            parent = dict()
+
+            # the boundary edges are turned into pairs of local roots in the workers too, which leaves
+            # only the distinct pairs of roots to be merged here
+            for pairs in executor.map(_boundary_roots, boundaries):
+                for position in range(0, len(pairs), 2):
+                    outside, root = pairs[position], pairs[position + 1]
+                    parent.setdefault(outside, outside)
+                    parent.setdefault(root, root)
+                    _union(parent, outside, root)
+
+            roots = {label: _find(parent, label) for label in parent}
+            roots = {label: root for label, root in roots.items() if label != root}
+
+            if roots:
+                list(executor.map(_relabel_range, *zip(*ranges), [roots] * len(ranges)))
+
+        result = array('i', labels)
+
+    finally:
+        labels.release()
+        release(blocks)
+
+    return result
+
+
+def _attach_adjacency(layout: []) -> None:
+    """
+    Worker initializer, maps the shared offsets, neighbours and labels arrays.
+    """
+
+    global _shared_adjacency
+
+    # the blocks are kept alongside the views so they stay open for the life of the worker
+    _shared_adjacency = attach_arrays(layout)
+
+
+def _label_range(start: int, end: int) -> array:
+    """
+    Worker task, labels every vertex start .. end - 1 with the first vertex of its component in the subgraph
+    of the edges inside the range. Returns the edges to vertices after the range as a flat array of
+    outside vertex, local root pairs, each pair once. Edges to vertices before the range are returned
+    by the worker of that range.
+    """
+
+    offsets, neighbours, labels = _shared_adjacency[1]
+    boundary = set()
+
+    for root in range(start, end):
+
+        if labels[root] >= 0:
+            continue
+
+        labels[root] = root
+        stack = [root]
+
+        while stack:
+            vertex = stack.pop()
+
+            for element in neighbours[offsets[vertex]:offsets[vertex + 1]]:
+                if element >= end:
+                    boundary.add((element, root))
+                elif element >= start and labels[element] < 0:
+                    labels[element] = root
+                    stack.append(element)
+
+    pairs = array('i')
+
+    for pair in boundary:
+        pairs.extend(pair)
+
+    return pairs
+
+
+def _boundary_roots(pairs: array) -> array:
+    """
+    Worker task, replaces the outside vertex of every outside vertex, local root pair from _label_range()
+    by its own local root and returns the distinct pairs of different roots as a flat array.
+    """
+
+    labels = _shared_adjacency[1][2]
+    roots = set()
+
+    for position in range(0, len(pairs), 2):
+        outside = labels[pairs[position]]
+        root = pairs[position + 1]
+        if outside != root:
+            roots.add((outside, root))
+
+    result = array('i')
+
+    for pair in roots:
+        result.extend(pair)
+
+    return result
+
+
+def _relabel_range(start: int, end: int, roots: dict) -> None:
+    """
+    Worker task, replaces the local roots of the vertices start .. end - 1 by the merged roots.
+    """
+
+    labels = _shared_adjacency[1][2]
+
+    for vertex in range(start, end):
+        root = roots.get(labels[vertex])
+        if root is not None:
+            labels[vertex] = root
+
+
+def _find(parent: dict, vertex: int) -> int:
+    """
+    Returns the root of a vertex in a union-find held as a dict of parents, halving the path.
+    """
+
+    while parent[vertex] != vertex:
+        parent[vertex] = parent[parent[vertex]]
+        vertex = parent[vertex]
+
+    return vertex
+
+
+def _union(parent: dict, u: int, v: int) -> None:
+    """
+    Merges the sets of "u" and "v". The smaller root becomes the root of both, so every component
+    ends up labelled by its first vertex, as component_labels() does.
+    """
 
-                if vertex in route:
-                    return True
+    u = _find(parent, u)
+    v = _find(parent, v)
 
-        return False
+    if u < v:
+        parent[v] = u
+    elif v < u:
+        parent[u] = v
 
 
 if __name__ == '__main__':